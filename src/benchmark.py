@@ -0,0 +1,541 @@
+import argparse
+import contextlib
+import copy
+import datetime
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, List
+import numpy as np
+
+from graph import Coords, GraphEncoder, build_graph, load_graph
+
+
+def timeit(fn: Callable[[], Any], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def random_points(nodes: List[Any], count: int, seed: int) -> List[Coords]:
+    rnd = random.Random(seed)
+    xs = [node[0] for node in nodes]
+    ys = [node[1] for node in nodes]
+
+    return [
+        Coords(rnd.uniform(min(xs), max(xs)), rnd.uniform(min(ys), max(ys)))
+        for _ in range(count)
+    ]
+
+
+def report(name: str, seconds: float, ops: int) -> None:
+    print(f"{name:<32} {seconds * 1e9 / ops:>10.1f} ns/op")
+
+
+def bench_coords(src_dir: str, samples: int, seed: int) -> None:
+    graph = load_graph(f"{src_dir}/{src_dir}_out", binary=True)
+    nodes, edges = list(graph.nodes), list(graph.edges)
+    points = random_points(nodes, samples, seed)
+    ops = len(points) * len(edges)
+
+    print(f"{len(points)} points x {len(edges)} edges")
+
+    report(
+        "Edge.closest_point",
+        timeit(lambda: [e.closest_point(p) for p in points for e in edges]),
+        ops,
+    )
+    report(
+        "Edge.distance_to",
+        timeit(lambda: [e.distance_to(p) for p in points for e in edges]),
+        ops,
+    )
+    report(
+        "Edge.contains",
+        timeit(lambda: [e.contains(p) for p in points for e in edges]),
+        ops,
+    )
+    report(
+        "Coords arithmetic",
+        timeit(lambda: [(p - e[0].coords) * 0.5 + p for p in points for e in edges]),
+        ops,
+    )
+
+    blocks = sys.getallocatedblocks()
+    projections = [p.project_on(e) for p in points for e in edges]
+    blocks = sys.getallocatedblocks() - blocks
+
+    tracemalloc.start()
+    projections = [p.project_on(e) for p in points for e in edges]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{'blocks per Coords':<32} {blocks / len(projections):>10.2f}")
+    print(f"{'bytes per Coords':<32} {size / len(projections):>10.1f}")
+
+
+def peak_memory(fn: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+# Parameters used to build the bundled maps
+SAMPLES = {
+    "new_york": (
+        "New York",
+        0,
+        (3, 40.74605893499274, -73.99053528624474),
+        259.19,
+    ),
+    "detroit_conant": (
+        "Detroit",
+        1,
+        (2, 42.43049082474931, -83.07592347811368),
+        803.87,
+    ),
+}
+
+
+def build_sample_model(src_dir: str, out_dir: str) -> Any:
+    from format import build_model
+
+    name, n0, n1, d_feets = SAMPLES[src_dir]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return build_model(src_dir, name, 333.33, n0, n1, d_feets, out_dir=out_dir)
+
+
+def scale_model(model: Any, scale: int) -> None:
+    # Emulates a larger map by tiling the graph scale times
+    graph = model["graph"]
+    nodes_count = len(graph["nodes"])
+
+    graph["nodes"] = graph["nodes"] * scale
+    graph["nodes_features"] = graph["nodes_features"] * scale
+    graph["edges"] = [
+        (node1 + i * nodes_count, node2 + i * nodes_count)
+        for i in range(scale)
+        for node1, node2 in graph["edges"]
+    ]
+    graph["edges_features"] = graph["edges_features"] * scale
+
+
+def bench_serialize(src_dir: str, scale: int) -> None:
+    from model_writer import write_model
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        model = build_sample_model(src_dir, out_dir)
+        scale_model(model, scale)
+        path = f"{out_dir}/model.json"
+
+        print(
+            f"{len(model['graph']['nodes'])} nodes, "
+            f"{len(model['graph']['edges'])} edges, "
+            f"{len(model['graph']['points_of_interest'])} PoIs"
+        )
+
+        def dump() -> None:
+            with open(path, "w") as f:
+                json.dump(model, f, indent=4, cls=GraphEncoder)
+
+        writers = {
+            "json.dump indent=4": dump,
+            "write_model": lambda: write_model(model, path),
+            "write_model compact": lambda: write_model(model, path, compact=True),
+            "write_model compact precision=3": lambda: write_model(
+                model, path, compact=True, precision=3
+            ),
+        }
+
+        for name, fn in writers.items():
+            seconds = timeit(fn, repeat=10)
+            peak = peak_memory(fn)
+            size = os.path.getsize(path)
+            print(
+                f"{name:<32} {seconds * 1e3:>8.2f} ms {size / 1024:>8.1f} KiB "
+                f"{peak / 1024:>8.1f} KiB peak"
+            )
+
+
+def bench_pois(src_dir: str, copies: int, seed: int) -> None:
+    from format import get_georeference
+    from format_edges import format_edges
+    from format_nodes import format_nodes
+    from categories import normalize_categories
+    from format_pois import format_pois, poi_transform, read_pois
+    from opening_hours import OpeningHoursIndex, parse_opening_hours
+
+    _, n0, n1, d_feets = SAMPLES[src_dir]
+
+    with open(f"{src_dir}/nodes.json", "r") as f, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        nodes, nodes_features, _ = format_nodes(json.load(f), n0, n1[0], d_feets)
+    with open(f"{src_dir}/edges.json", "r") as f:
+        edges, streets, edges_features = format_edges(json.load(f))
+
+    graph = build_graph(nodes, nodes_features, edges, streets, edges_features)
+    georeference = get_georeference(nodes, [n1])
+
+    # Copies get distinct names, otherwise they would be skipped as duplicates
+    pois = list()
+    for i in range(copies):
+        for poi in read_pois(f"{src_dir}/pois.json"):
+            if "name" in poi:
+                poi["name"] = f"{poi['name']} {i}"
+            pois.append(poi)
+
+    categories = [tuple(poi.get("categories", list())) for poi in pois]
+
+    def run_categories() -> None:
+        for c in categories:
+            normalize_categories.__wrapped__(c)
+
+    def run_categories_cached() -> None:
+        for c in categories:
+            normalize_categories(c)
+
+    hours = [poi["opening_hours"] for poi in pois if "opening_hours" in poi]
+
+    def run_opening_hours() -> None:
+        for h in hours:
+            parse_opening_hours.__wrapped__(h)
+
+    def run_opening_hours_cached() -> None:
+        for h in hours:
+            parse_opening_hours(h)
+
+    def run_transform() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # The transform works in place, nested dicts are replaced or
+            # only get keys set again
+            for poi in pois:
+                poi_transform(dict(poi))
+
+    def run_format() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            format_pois(
+                copy.deepcopy(pois), graph, 333.33, georeference, random_seed=seed
+            )
+
+    print(f"{len(pois)} PoIs")
+
+    for name, fn in (
+        ("normalize_categories", run_categories),
+        ("normalize_categories (cached)", run_categories_cached),
+        ("poi_transform", run_transform),
+        ("format_pois", run_format),
+    ):
+        seconds = timeit(fn, repeat=3)
+        print(f"{name:<32} {len(pois) / seconds:>10.0f} PoIs/s")
+
+    for name, fn in (
+        ("parse_opening_hours", run_opening_hours),
+        ("parse_opening_hours (cached)", run_opening_hours_cached),
+    ):
+        seconds = timeit(fn, repeat=3)
+        print(f"{name:<32} {len(hours) / seconds:>10.0f} strings/s")
+
+    # "What's open now" over the formatted PoIs, at every minute of the week
+    with contextlib.redirect_stdout(io.StringIO()):
+        formatted = format_pois(
+            copy.deepcopy(pois), graph, 333.33, georeference, random_seed=seed
+        )
+    index = OpeningHoursIndex(formatted)
+    times = [
+        (day, datetime.time(hour, minute))
+        for day in range(7)
+        for hour in range(24)
+        for minute in range(60)
+    ]
+
+    def run_open_at() -> None:
+        for day, t in times:
+            index.open_at(day, t)
+
+    seconds = timeit(run_open_at, repeat=3)
+    print(f"{'OpeningHoursIndex.open_at':<32} {len(times) / seconds:>10.0f} queries/s")
+
+
+def percentiles(latencies: List[float]) -> str:
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return f"p50 {p50 * 1e6:>8.1f} us  p99 {p99 * 1e6:>8.1f} us"
+
+
+def bench_locate(src_dir: str, samples: int, seed: int) -> None:
+    from graph import load_locator
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        build_sample_model(src_dir, out_dir)
+        locator = load_locator(out_dir)
+
+    nodes = list(locator.graph.nodes)
+    points = random_points(nodes, samples, seed)
+    radius = 1.0 * 333.33  # about a fingertip, one inch on the map
+
+    print(
+        f"{len(points)} points, {len(nodes)} nodes, {len(locator.graph.edges)} "
+        f"edges, {len(locator.poi_index)} PoIs"
+    )
+
+    queries = {
+        "nearest_node": locator.nearest_node,
+        "nearest_edge": locator.nearest_edge,
+        "nearest_poi": locator.nearest_poi,
+        "nearest": locator.nearest,
+        "within 1 inch": lambda p: locator.within(p, radius),
+    }
+
+    for name, query in queries.items():
+        # First pass builds the descriptions, only the second one is timed
+        for point in points:
+            query(point)
+
+        latencies = list()
+        for point in points:
+            start = time.perf_counter()
+            query(point)
+            latencies.append(time.perf_counter() - start)
+
+        print(f"{name:<32} {percentiles(latencies)}")
+
+    # Nearest node, edge and PoI of every point, one at a time and batched
+    def run_scalar() -> None:
+        for point in points:
+            locator.nearest_node(point)
+            locator.nearest_edge(point)
+            locator.nearest_poi(point)
+
+    array = np.array([(p.x, p.y) for p in points], dtype=np.float64)
+    for name, fn in (
+        ("nearest_* per point", run_scalar),
+        ("locate_batch", lambda: locator.locate_batch(array)),
+    ):
+        seconds = timeit(fn, repeat=3)
+        print(f"{name:<32} {len(points) / seconds:>10.0f} samples/s")
+
+    # Batches of the size of a smoothing window
+    window = array[:32]
+    seconds = timeit(lambda: locator.locate_batch(window), repeat=100)
+    print(f"{'locate_batch of 32':<32} {len(window) / seconds:>10.0f} samples/s")
+
+
+def grid_graph(side: int, seed: int) -> Any:
+    # side x side blocks of 300 feets, a fifth of the streets one way and
+    # random stairs and intersection features
+    from graph import edge_default_features
+
+    rnd = random.Random(seed)
+
+    coords = [Coords(x * 300.0, y * 300.0) for y in range(side) for x in range(side)]
+    nodes_features = [
+        {
+            "crosswalk": rnd.random() < 0.7,
+            "walk_light": rnd.random() < 0.4,
+            "tactile_paving": rnd.random() < 0.3,
+        }
+        for _ in coords
+    ]
+
+    edges: List[Any] = list()
+    streets = dict()
+    edges_features: List[Any] = list()
+
+    for name, step, count in (("Street", 1, side), ("Avenue", side, side)):
+        for i in range(count):
+            direction = rnd.choice(
+                ["two_way"] * 8 + ["one_way_forward", "one_way_backward"]
+            )
+            first = i * side if step == 1 else i
+
+            streets[f"{name} {i}"] = list()
+            for j in range(side - 1):
+                node = first + j * step
+                streets[f"{name} {i}"].append(len(edges))
+                edges.append((node, node + step))
+                edges_features.append(
+                    {
+                        **edge_default_features,
+                        "traffic_direction": direction,
+                        "stairs": rnd.random() < 0.05,
+                    }
+                )
+
+    return build_graph(coords, nodes_features, edges, streets, edges_features)
+
+
+def bench_route(samples: int, seed: int, scale: int) -> None:
+    from graph import Router, compute_distance_table, routing_profiles
+
+    side = 100 * scale
+    graph = grid_graph(side, seed)
+    rnd = random.Random(seed)
+    pairs = [
+        (rnd.randrange(len(graph.nodes)), rnd.randrange(len(graph.nodes)))
+        for _ in range(samples)
+    ]
+
+    print(f"{len(graph.nodes)} nodes, {len(graph.edges)} edges, {len(pairs)} routes")
+
+    for profile in routing_profiles:
+        start = time.perf_counter()
+        router = Router(graph, profile)
+        build = time.perf_counter() - start
+
+        latencies = list()
+        found = 0
+        for source, target in pairs:
+            start = time.perf_counter()
+            found += router.route(source, target) is not None
+            latencies.append(time.perf_counter() - start)
+
+        print(
+            f"{profile:<20} build {build:>6.2f} s  {percentiles(latencies)}  "
+            f"{found} found"
+        )
+
+    # All pairs tables only fit small graphs, compared with searching them
+    graph = grid_graph(20 * scale, seed)
+    pairs = [
+        (rnd.randrange(len(graph.nodes)), rnd.randrange(len(graph.nodes)))
+        for _ in range(samples)
+    ]
+    print(f"{len(graph.nodes)} nodes, {len(graph.edges)} edges, {len(pairs)} routes")
+
+    for profile in ("shortest", "accessible"):
+        router = Router(graph, profile)
+        start = time.perf_counter()
+        table = compute_distance_table(router.arcs)
+        build = time.perf_counter() - start
+
+        for name, r in (
+            ("search", router),
+            ("table", Router(graph, profile, router.landmarks, table)),
+        ):
+            latencies = list()
+            for source, target in pairs:
+                start = time.perf_counter()
+                r.route(source, target)
+                latencies.append(time.perf_counter() - start)
+            print(f"{profile + ' ' + name:<20} {percentiles(latencies)}")
+        print(f"{profile + ' table':<20} build {build:>6.2f} s")
+
+
+def bench_reach(samples: int, seed: int, scale: int) -> None:
+    from graph import (
+        category_mask,
+        compute_reachability,
+        default_reachability_radii,
+    )
+    from graph.reachability import bounded_dijkstra
+    from graph.routing import PROFILES, build_arcs
+
+    graph = grid_graph(100 * scale, seed)
+    rnd = random.Random(seed)
+
+    # A PoI every other edge, somewhere along it
+    pois = list()
+    for _ in range(len(graph.edges) // 2):
+        edge = rnd.choice(graph.edges)
+        t = rnd.random()
+        pois.append(
+            {
+                "edge": edge.index,
+                "coords": list(edge.node1.coords * (1 - t) + edge.node2.coords * t),
+                "categories": [rnd.choice(["catering.cafe", "commercial", "service"])],
+            }
+        )
+    print(f"{len(graph.nodes)} nodes, {len(graph.edges)} edges, {len(pois)} PoIs")
+
+    start = time.perf_counter()
+    table = compute_reachability(graph, pois)
+    build = time.perf_counter() - start
+    size = sum(
+        lists.offsets.nbytes + lists.deltas.nbytes for lists in table.edges + table.pois
+    )
+    print(f"build {build:.2f} s, {size / 2**20:.1f} MiB")
+
+    nodes = [rnd.randrange(len(graph.nodes)) for _ in range(samples)]
+    cafes = category_mask(pois, "catering")
+    arcs = build_arcs(graph, PROFILES["shortest"])
+
+    # search is the bounded search alone, the least answering on demand takes
+    for radius in default_reachability_radii:
+        for name, query in (
+            ("pois", lambda node: table.reachable_pois(node, radius)),
+            ("cafes", lambda node: table.reachable_pois(node, radius, cafes)),
+            ("search", lambda node: bounded_dijkstra(arcs, node, radius)),
+        ):
+            latencies = list()
+            for node in nodes:
+                start = time.perf_counter()
+                query(node)
+                latencies.append(time.perf_counter() - start)
+            print(f"{name + ' ' + str(radius):<20} {percentiles(latencies)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run micro benchmarks")
+
+    parser.add_argument(
+        "benchmark",
+        help="Benchmark to run",
+        choices=["coords", "serialize", "pois", "locate", "route", "reach"],
+    )
+    parser.add_argument(
+        "--src_dir",
+        help="Source files directory, already processed by format.py",
+        type=str,
+        default="new_york",
+        required=False,
+    )
+    parser.add_argument(
+        "--samples",
+        help="Number of random points",
+        type=int,
+        default=200,
+        required=False,
+    )
+    parser.add_argument(
+        "--seed",
+        help="Random seed",
+        type=int,
+        default=0,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--scale",
+        help="Number of copies of the graph (serialize) or of the PoIs (pois)",
+        type=int,
+        default=1,
+        required=False,
+    )
+
+    args = parser.parse_args()
+
+    if args.benchmark == "coords":
+        bench_coords(args.src_dir, args.samples, args.seed)
+    elif args.benchmark == "serialize":
+        bench_serialize(args.src_dir, args.scale)
+    elif args.benchmark == "pois":
+        bench_pois(args.src_dir, args.scale, args.seed)
+    elif args.benchmark == "locate":
+        bench_locate(args.src_dir, args.samples, args.seed)
+    elif args.benchmark == "route":
+        bench_route(args.samples, args.seed, args.scale)
+    elif args.benchmark == "reach":
+        bench_reach(args.samples, args.seed, args.scale)
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import pickle
+from typing import Any, Callable, List, Sequence, TypeVar
+
+T = TypeVar("T")
+
+CACHE_DIR = "cache"
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_fingerprint() -> str:
+    # Any change to the sources invalidates every stage
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(SRC_DIR):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(".py"):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, SRC_DIR).encode("utf-8"))
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+class BuildCache:
+    # Stores the output of every stage together with the fingerprint of
+    # its inputs, parameters and code; a stage whose fingerprint matches
+    # the stored one is skipped and its output loaded from the cache.
+    def __init__(self, cache_dir: str, force: bool = False) -> None:
+        self.cache_dir = cache_dir
+        self.force = force
+        self.code = code_fingerprint()
+
+        self.ran: List[str] = list()
+        self.cached: List[str] = list()
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def fingerprint(self, *parts: Any) -> str:
+        digest = hashlib.sha256(self.code.encode("utf-8"))
+        for part in parts:
+            if not isinstance(part, bytes):
+                part = json.dumps(part, sort_keys=True).encode("utf-8")
+            digest.update(len(part).to_bytes(8, "little"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def path(self, stage: str) -> str:
+        return f"{self.cache_dir}/{stage}.pickle"
+
+    def run(
+        self,
+        stage: str,
+        fingerprint: str,
+        fn: Callable[[], T],
+        outputs: Sequence[str] = (),
+    ) -> T:
+        # outputs are files written by fn, the stage reruns if any is missing
+        if not self.force and all(os.path.exists(path) for path in outputs):
+            try:
+                with open(self.path(stage), "rb") as f:
+                    cached_fingerprint, value = pickle.load(f)
+                if cached_fingerprint == fingerprint:
+                    self.cached.append(stage)
+                    return value
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+
+        value = fn()
+
+        tmp_path = f"{self.path(stage)}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((fingerprint, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path(stage))
+
+        self.ran.append(stage)
+        return value
+
+    def report(self) -> str:
+        return (
+            f"Stages run: {', '.join(self.ran) or 'none'}; "
+            f"cached: {', '.join(self.cached) or 'none'}"
+        )
@@ -0,0 +1,115 @@
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+CATEGORIES_CACHE_SIZE = 4096
+
+public_transports = {
+    "train": "station",
+    "subway": "station",
+    "bus": "stop",
+    "tram": "stop",
+}
+
+ignored_categories = ("wheelchair", "internet_access")
+
+
+class TrieNode:
+    __slots__ = ("count", "children")
+
+    def __init__(self) -> None:
+        self.count = 0  # number of stored strings going through the node
+        self.children: Dict[str, "TrieNode"] = dict()
+
+
+class PrefixTrie:
+    # Trie over the dot separated fields of a set of categories, answers
+    # whether any of them starts with a given string walking its fields
+    def __init__(self, strings: Iterable[str] = ()) -> None:
+        self.root = TrieNode()
+        self.strings: Dict[str, None] = dict()  # insertion ordered set
+
+        for string in strings:
+            self.add(string)
+
+    def __contains__(self, string: str) -> bool:
+        return string in self.strings
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.strings)
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def add(self, string: str) -> None:
+        if string in self.strings:
+            return
+        self.strings[string] = None
+
+        node = self.root
+        node.count += 1
+        for field in string.split("."):
+            child = node.children.get(field)
+            if child is None:
+                child = node.children[field] = TrieNode()
+            child.count += 1
+            node = child
+
+    def remove(self, string: str) -> None:
+        if string not in self.strings:
+            return
+        del self.strings[string]
+
+        node = self.root
+        node.count -= 1
+        for field in string.split("."):
+            child = node.children[field]
+            child.count -= 1
+            if child.count == 0:
+                del node.children[field]
+                return
+            node = child
+
+    def has_prefix(self, prefix: str) -> bool:
+        # The fields but the last one must match, the last one only has to
+        # be the start of a field
+        *fields, last = prefix.split(".")
+
+        node = self.root
+        for field in fields:
+            child = node.children.get(field)
+            if child is None:
+                return False
+            node = child
+
+        return any(child.startswith(last) for child in node.children)
+
+
+@lru_cache(maxsize=CATEGORIES_CACHE_SIZE)
+def normalize_categories(categories: Tuple[str, ...]) -> Tuple[str, ...]:
+    # Keeps the most specific categories: a category replaces its parents
+    # and is dropped if a kept one starts with it. Public transports are
+    # expanded, e.g. "public_transport.bus" -> "bus_stop", "public_transport"
+    res = PrefixTrie()
+
+    for category in categories:
+        if category.startswith(ignored_categories):
+            continue
+
+        fields = category.split(".")
+
+        parent = fields[0]
+        for field in fields[1:]:
+            res.remove(parent)
+            parent += "." + field
+
+        if fields[-1] in public_transports:
+            res.add(f"{fields[-1]}_{public_transports[fields[-1]]}")
+            res.add("public_transport")
+        elif not res.has_prefix(category):
+            res.add(category)
+
+    return tuple(res)
+
+
+def format_categories(categories: List[str]) -> List[str]:
+    return list(normalize_categories(tuple(categories)))
@@ -1,16 +1,13 @@
 import argparse
 import json
-import random
-from typing import Set
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, Optional
 import time
 
-from graph import latlng_distance
+from feature_stream import iter_features, read_features, write_feature_collection
+from placement import PoiPlacer, get_origin
 from utils import POI_TO_POI_MIN_DISTANCE, str_dict
 
-seed = time.time()
-random.seed(seed)
-print(f"Seed: {seed}")
-
 
 keys_to_remove = [
     "district",
@@ -29,68 +26,81 @@ keys_to_remove = [
 ]
 
 
-def main(src_dir: str, name: str, feets_per_inch: float) -> None:
+def main(
+    src_dir: str,
+    name: str,
+    feets_per_inch: float,
+    seed: Optional[float] = None,
+    max_attempts: int = 100,
+) -> None:
     min_distance = POI_TO_POI_MIN_DISTANCE * feets_per_inch
 
-    with open(f"pois_new_york.json", "r") as f:
-        new_york_pois = json.load(f)["features"]
+    if seed is None:
+        seed = time.time()
+    print(f"Seed: {seed}")
 
+    # Features of the map first, then the converted New York ones as they
+    # are read
+    members: Dict[str, Any] = dict()
     with open(f"{src_dir}/map_pois.json", "r") as f:
-        data = json.load(f)
+        map_pois = list(iter_features(f, members))
 
     with open(f"{src_dir}/conversion.json", "r") as f:
         new_york_streets = json.load(f)
 
-    to_remove: Set[int] = set()
-    for i, poi in enumerate(new_york_pois):
-        properties = poi["properties"]
-
-        for key in keys_to_remove:
-            if key in properties:
-                del properties[key]
-
-        properties["city"] = name
-
-        if properties["street"] not in new_york_streets.keys():
-            print(f"Street not found: {properties['street']}")
-            to_remove.add(i)
-            continue
-
-        conversion = new_york_streets[properties["street"]]
-        properties["street"] = conversion[0]
-
-        if "branch" in properties:
-            properties["branch"] = conversion[0]
-
-        poi_str = str_dict(properties).lower()
-        if "ny" in poi_str or "new york" in poi_str or "new-york" in poi_str:
-            print(f"New York references found in {properties['name']}")
-
-        coord_found = False
-        while not coord_found:
-            properties["lon"] = random.uniform(*conversion[1])
-            properties["lat"] = random.uniform(*conversion[2])
-
-            coord_found = True
-            for j in range(i):
-                if (
-                    latlng_distance(
-                        properties["lat"],
-                        properties["lon"],
-                        new_york_pois[j]["properties"]["lat"],
-                        new_york_pois[j]["properties"]["lon"],
-                    )
-                    < min_distance
-                ):
-                    coord_found = False
-                    break
-
-    data["features"] += [
-        poi for i, poi in enumerate(new_york_pois) if i not in to_remove
-    ]
+    placer = PoiPlacer(
+        min_distance,
+        get_origin([(c[1], c[2]) for c in new_york_streets.values()]),
+        seed,
+        max_attempts,
+    )
+
+    def convert(pois: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for poi in pois:
+            properties = poi["properties"]
+            properties["city"] = name
+
+            if properties["street"] not in new_york_streets.keys():
+                print(f"Street not found: {properties['street']}")
+                continue
+
+            conversion = new_york_streets[properties["street"]]
+            properties["street"] = conversion[0]
+
+            if "branch" in properties:
+                properties["branch"] = conversion[0]
+
+            poi_str = str_dict(properties).lower()
+            if "ny" in poi_str or "new york" in poi_str or "new-york" in poi_str:
+                print(f"New York references found in {properties['name']}")
+
+            placement = placer.place(conversion[1], conversion[2])
+            properties["lon"] = placement.lng
+            properties["lat"] = placement.lat
+
+            if placement.fallback:
+                print(
+                    f"Could not place {properties['name']} at least {min_distance} "
+                    f"feets from other PoIs, closest one is {placement.distance} "
+                    "feets away"
+                )
+
+            yield poi
 
     with open(f"{src_dir}/pois.json", "w") as f:
-        json.dump(data, f, indent=4)
+        write_feature_collection(
+            f,
+            members,
+            chain(
+                map_pois,
+                convert(read_features("pois_new_york.json", keys_to_remove)),
+            ),
+        )
+
+    if placer.fallbacks > 0:
+        print(
+            f"{placer.fallbacks} PoIs placed after exhausting {max_attempts} attempts"
+        )
 
 
 if __name__ == "__main__":
@@ -116,5 +126,20 @@ if __name__ == "__main__":
         required=True,
     )
 
+    parser.add_argument(
+        "--seed",
+        help="Random seed used to place the PoIs, defaults to the current time",
+        type=float,
+        default=None,
+        required=False,
+    )
+    parser.add_argument(
+        "--max_attempts",
+        help="Maximum number of random positions tried for each PoI",
+        type=int,
+        default=100,
+        required=False,
+    )
+
     args = parser.parse_args()
-    main(args.src_dir, args.name, args.feets_per_inch)
+    main(args.src_dir, args.name, args.feets_per_inch, args.seed, args.max_attempts)
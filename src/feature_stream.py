@@ -0,0 +1,164 @@
+import json
+import re
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Sequence
+
+CHUNK_SIZE = 1 << 16
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class JSONStream:
+    # Buffered reader decoding one JSON value at a time, the buffer only
+    # holds the value being decoded and what is left of the last chunk
+    def __init__(self, f: IO[str], chunk_size: int = CHUNK_SIZE) -> None:
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> None:
+        chunk = self.f.read(self.chunk_size)
+        if chunk == "":
+            self.eof = True
+        self.text = self.text[self.pos :] + chunk
+        self.pos = 0
+
+    def skip_whitespace(self) -> None:
+        while True:
+            self.pos = WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text) or self.eof:
+                return
+            self.fill()
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self.text, self.pos)
+
+    def next_char(self) -> str:
+        self.skip_whitespace()
+        if self.pos >= len(self.text):
+            raise self.error("Unexpected end of file")
+
+        char = self.text[self.pos]
+        self.pos += 1
+        return char
+
+    def peek(self) -> str:
+        self.skip_whitespace()
+        return self.text[self.pos : self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        if self.next_char() != char:
+            self.pos -= 1
+            raise self.error(f"Expecting '{char}'")
+
+    def decode(self) -> Any:
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.fill()
+                continue
+
+            # A number may continue in the next chunk
+            if end == len(self.text) and not self.eof:
+                self.fill()
+                continue
+
+            self.pos = end
+            return value
+
+
+def iter_features(
+    f: IO[str],
+    members: Optional[Dict[str, Any]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    # Yields the features of a FeatureCollection one at a time. The other
+    # members are stored in members as they are read, with "features" set
+    # to None to keep its position.
+    stream = JSONStream(f, chunk_size)
+
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+
+    while True:
+        key = stream.decode()
+        stream.expect(":")
+
+        if key == "features":
+            if members is not None:
+                members["features"] = None
+
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.next_char()
+            else:
+                while True:
+                    yield stream.decode()
+                    char = stream.next_char()
+                    if char == "]":
+                        break
+                    if char != ",":
+                        stream.pos -= 1
+                        raise stream.error("Expecting ',' or ']'")
+        else:
+            value = stream.decode()
+            if members is not None:
+                members[key] = value
+
+        char = stream.next_char()
+        if char == "}":
+            return
+        if char != ",":
+            stream.pos -= 1
+            raise stream.error("Expecting ',' or '}'")
+
+
+def read_features(
+    path: str, keys_to_remove: Sequence[str] = ()
+) -> Iterator[Dict[str, Any]]:
+    # Features of the FeatureCollection at path, without keys_to_remove in
+    # their properties
+    with open(path, "r") as f:
+        for feature in iter_features(f):
+            properties = feature["properties"]
+            for key in keys_to_remove:
+                if key in properties:
+                    del properties[key]
+            yield feature
+
+
+def read_properties(
+    path: str, keys_to_remove: Sequence[str] = ()
+) -> Iterator[Dict[str, Any]]:
+    for feature in read_features(path, keys_to_remove):
+        yield feature["properties"]
+
+
+def write_feature_collection(
+    f: IO[str], members: Dict[str, Any], features: Iterable[Dict[str, Any]]
+) -> None:
+    # Same output as json.dump({**members, "features": [...]}, f, indent=4),
+    # writing the features as they are produced
+    f.write("{")
+
+    for i, (key, value) in enumerate(members.items()):
+        f.write(("," if i > 0 else "") + "\n    " + json.dumps(key) + ": ")
+
+        if key != "features":
+            f.write(json.dumps(value, indent=4).replace("\n", "\n    "))
+            continue
+
+        empty = True
+        for feature in features:
+            f.write(("[" if empty else ",") + "\n        ")
+            f.write(json.dumps(feature, indent=4).replace("\n", "\n        "))
+            empty = False
+        f.write("[]" if empty else "\n    ]")
+
+    f.write("\n}" if len(members) > 0 else "}")
@@ -1,11 +1,38 @@
 import argparse
 import json
 import os
-from typing import Tuple
+import shutil
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+from build_cache import CACHE_DIR, BuildCache, file_digest
 from format_edges import format_edges
 from format_nodes import format_nodes
-from format_pois import format_pois
+from format_pois import describe_conflicts, format_pois, read_pois
+from format_pois import seed as time_seed
+from graph import (
+    AffineGeoreference,
+    BINARY_GRAPH_FILE,
+    DISTANCE_TABLES_DIR,
+    MAX_TABLE_BYTES,
+    REACHABILITY_FILE,
+    ROUTING_FILE,
+    Coords,
+    Graph,
+    GraphEncoder,
+    LatLngReference,
+    Router,
+    build_graph,
+    compute_reachability,
+    default_reachability_radii,
+    distance_table_size,
+    routing_profiles,
+    save_distance_tables,
+    save_graph,
+    save_landmarks,
+    save_reachability,
+)
+from model_writer import write_model
 
 
 def parse_n1(node: str) -> Tuple[int, float, float]:
@@ -18,41 +45,197 @@ def parse_n1(node: str) -> Tuple[int, float, float]:
     return index, lat, lon
 
 
-def main(
+def parse_references(references: str) -> List[Tuple[int, float, float]]:
+    return [parse_n1(node) for node in references.split(";") if node.strip() != ""]
+
+
+def get_georeference(
+    nodes: Sequence[Sequence[float]], references: List[Tuple[int, float, float]]
+) -> AffineGeoreference:
+    latlng_references = [
+        LatLngReference(Coords(*nodes[index]), lat, lon)
+        for index, lat, lon in references
+    ]
+
+    if len(latlng_references) < 3:
+        if len(latlng_references) > 1:
+            print("At least 3 reference nodes are needed to fit a transform, using n1")
+        return AffineGeoreference.from_reference(latlng_references[0])
+
+    georeference = AffineGeoreference.fit(latlng_references)
+    residuals = georeference.residuals(latlng_references)
+    print(f"Georeference max residual: {residuals.max()} feets")
+
+    return georeference
+
+
+def write_json(path: str, data: Any) -> None:
+    with open(path, "w") as f:
+        json.dump(data, f, indent=4, cls=GraphEncoder)
+
+
+def build_model(
     src_dir: str,
     name: str,
-    feets_per_inch,
+    feets_per_inch: float,
     n0: int,
     n1: Tuple[int, float, float],
     d_feets: float,
-) -> None:
-    out_dir = f"{src_dir}/{src_dir}_out"
+    references: Optional[List[Tuple[int, float, float]]] = None,
+    out_dir: Optional[str] = None,
+    intermediate: bool = False,
+    compact: bool = False,
+    precision: Optional[int] = None,
+    force: bool = False,
+    workers: int = 1,
+    seed: Optional[float] = None,
+    distance_tables: Sequence[str] = (),
+    reachability_radii: Sequence[float] = default_reachability_radii,
+) -> Dict[str, Any]:
+    if out_dir is None:
+        out_dir = f"{src_dir}/{src_dir}_out"
     if not os.path.exists(out_dir):
         os.makedirs(out_dir)
 
-    feets_per_pixel = format_nodes(src_dir, n0, n1[0], d_feets)
-    format_edges(src_dir)
-    format_pois(src_dir, feets_per_inch, *n1)
+    cache = BuildCache(f"{out_dir}/{CACHE_DIR}", force)
+    reference_nodes = [n1, *(references or [])]
 
-    graph = dict()
+    with open(f"{src_dir}/nodes.json", "rb") as f:
+        nodes_data = f.read()
+    nodes_key = cache.fingerprint(nodes_data, n0, n1[0], d_feets)
+    nodes, nodes_features, feets_per_pixel = cache.run(
+        "nodes",
+        nodes_key,
+        lambda: format_nodes(json.loads(nodes_data), n0, n1[0], d_feets),
+    )
 
-    with open(f"{out_dir}/nodes.json", "r") as f:
-        graph["nodes"] = json.load(f)
+    with open(f"{src_dir}/edges.json", "rb") as f:
+        edges_data = f.read()
+    edges_key = cache.fingerprint(edges_data)
+    edges, streets, edges_features = cache.run(
+        "edges", edges_key, lambda: format_edges(json.loads(edges_data))
+    )
 
-    with open(f"{out_dir}/edges.json", "r") as f:
-        graph["edges"] = json.load(f)
+    @lru_cache(maxsize=None)
+    def get_street_graph() -> Graph:
+        return build_graph(nodes, nodes_features, edges, streets, edges_features)
 
-    with open(f"{out_dir}/streets.json", "r") as f:
-        graph["streets"] = json.load(f)
+    georeference = get_georeference(nodes, reference_nodes)
 
-    with open(f"{out_dir}/pois.json", "r") as f:
-        graph["points_of_interest"] = json.load(f)
+    # Without a seed the PoIs are placed with the time seed of format_pois,
+    # which also keeps them and the stages using them out of the cache
+    if seed is None:
+        seed = time_seed
+        print(f"No seed given, the PoIs are placed again with the time seed {seed}")
 
-    with open(f"{out_dir}/nodes_features.json", "r") as f:
-        graph["nodes_features"] = json.load(f)
+    def place_pois() -> Tuple[List[Dict[str, Any]], List[str]]:
+        # The conflicts are kept with the PoIs to report them on cache hits
+        placed = format_pois(
+            read_pois(pois_path),
+            get_street_graph(),
+            feets_per_inch,
+            georeference,
+            workers,
+            seed,
+        )
+        return placed, describe_conflicts(placed, get_street_graph(), feets_per_inch)
 
-    with open(f"{out_dir}/edges_features.json", "r") as f:
-        graph["edges_features"] = json.load(f)
+    pois_path = f"{src_dir}/pois.json"
+    pois_key = cache.fingerprint(
+        file_digest(pois_path),
+        nodes_key,
+        edges_key,
+        feets_per_inch,
+        reference_nodes,
+        seed,
+    )
+    pois, conflicts = cache.run("pois", pois_key, place_pois)
+    for conflict in conflicts:
+        print(conflict)
+
+    binary_graph = f"{out_dir}/{BINARY_GRAPH_FILE}"
+    cache.run(
+        "graph",
+        cache.fingerprint(nodes_key, edges_key),
+        lambda: save_graph(get_street_graph(), binary_graph),
+        [binary_graph],
+    )
+
+    # Landmarks of the routing profiles, so routers do not compute them
+    routing = f"{out_dir}/{ROUTING_FILE}"
+    cache.run(
+        "routing",
+        cache.fingerprint(nodes_key, edges_key),
+        lambda: save_landmarks(
+            routing,
+            {
+                name: Router(get_street_graph(), profile).landmarks
+                for name, profile in routing_profiles.items()
+            },
+        ),
+        [routing],
+    )
+
+    # All pairs tables of the distance_tables profiles, routers search the
+    # graph for the other profiles or when the tables would be too large
+    tables_dir = f"{out_dir}/{DISTANCE_TABLES_DIR}"
+    if distance_tables and distance_table_size(len(nodes)) > MAX_TABLE_BYTES:
+        print(f"Distance tables of {len(nodes)} nodes are too large, skipped")
+        distance_tables = ()
+    if distance_tables:
+        cache.run(
+            "distances",
+            cache.fingerprint(nodes_key, edges_key, sorted(distance_tables)),
+            lambda: save_distance_tables(
+                tables_dir, get_street_graph(), distance_tables
+            ),
+            [
+                f"{tables_dir}/{name}.{array}.npy"
+                for name in distance_tables
+                for array in ("distances", "next_hops")
+            ],
+        )
+    elif os.path.exists(tables_dir):
+        shutil.rmtree(tables_dir)
+
+    # Edges and PoIs reachable from every node within reachability_radii
+    reachability = f"{out_dir}/{REACHABILITY_FILE}"
+    if reachability_radii:
+        cache.run(
+            "reachability",
+            cache.fingerprint(pois_key, sorted(reachability_radii)),
+            lambda: save_reachability(
+                reachability,
+                compute_reachability(get_street_graph(), pois, reachability_radii),
+            ),
+            [reachability],
+        )
+    elif os.path.exists(reachability):
+        os.remove(reachability)
+
+    descriptions = cache.run(
+        "descriptions",
+        cache.fingerprint(nodes_key, edges_key),
+        lambda: get_street_graph().descriptions.to_json(list(streets.keys())),
+    )
+
+    if intermediate:
+        write_json(f"{out_dir}/nodes.json", nodes)
+        write_json(f"{out_dir}/nodes_features.json", nodes_features)
+        write_json(f"{out_dir}/edges.json", edges)
+        write_json(f"{out_dir}/streets.json", streets)
+        write_json(f"{out_dir}/edges_features.json", edges_features)
+        write_json(f"{out_dir}/pois.json", pois)
+
+    graph: Dict[str, Any] = {
+        "nodes": nodes,
+        "edges": edges,
+        "streets": streets,
+        "points_of_interest": pois,
+        "nodes_features": nodes_features,
+        "edges_features": edges_features,
+        "descriptions": descriptions,
+    }
 
     graph["reference_system"] = {
         "north": [0, 1],
@@ -61,11 +244,11 @@ def main(
         "west": [-1, 0],
     }
 
-    n1_coords = graph["nodes"][n1[0]]
     graph["latlng_reference"] = {
-        "coords": n1_coords,
+        "coords": nodes[n1[0]],
         "lat": n1[1],
         "lng": n1[2],
+        **georeference.to_json(),
     }
 
     model = {
@@ -85,8 +268,55 @@ def main(
         },
     }
 
-    with open(f"{out_dir}/model.json", "w") as f:
-        json.dump(model, f, indent=4)
+    model_json = f"{out_dir}/model.json"
+    cache.run(
+        "model",
+        cache.fingerprint(
+            pois_key, name, feets_per_inch, reference_nodes, compact, precision
+        ),
+        lambda: write_model(model, model_json, compact, precision),
+        [model_json],
+    )
+
+    print(cache.report())
+
+    return model
+
+
+def main(
+    src_dir: str,
+    name: str,
+    feets_per_inch,
+    n0: int,
+    n1: Tuple[int, float, float],
+    d_feets: float,
+    references: Optional[List[Tuple[int, float, float]]] = None,
+    intermediate: bool = False,
+    compact: bool = False,
+    precision: Optional[int] = None,
+    force: bool = False,
+    workers: int = 1,
+    seed: Optional[float] = None,
+    distance_tables: Sequence[str] = (),
+    reachability_radii: Sequence[float] = default_reachability_radii,
+) -> None:
+    build_model(
+        src_dir,
+        name,
+        feets_per_inch,
+        n0,
+        n1,
+        d_feets,
+        references,
+        intermediate=intermediate,
+        compact=compact,
+        precision=precision,
+        force=force,
+        workers=workers,
+        seed=seed,
+        distance_tables=distance_tables,
+        reachability_radii=reachability_radii,
+    )
 
 
 if __name__ == "__main__":
@@ -112,6 +342,13 @@ if __name__ == "__main__":
         type=str,
         required=True,
     )
+    parser.add_argument(
+        "--references",
+        help="Additional reference nodes used to fit the georeference transform, eg: (5, 40.74, -73.98); (9, 40.75, -73.99)",
+        type=str,
+        default="",
+        required=False,
+    )
     parser.add_argument(
         "--d_feets",
         help="Distance in meters between n0 and n1",
@@ -126,6 +363,60 @@ if __name__ == "__main__":
         required=True,
     )
 
+    parser.add_argument(
+        "--intermediate",
+        help="Also write the intermediate nodes, edges, streets and PoIs files",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--compact",
+        help="Write model.json without indentation",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--precision",
+        help="Decimal digits kept for node and PoI coordinates, defaults to all",
+        type=int,
+        default=None,
+        required=False,
+    )
+    parser.add_argument(
+        "--force",
+        help="Rerun every stage, ignoring the build cache",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of processes used to format the PoIs",
+        type=int,
+        default=1,
+        required=False,
+    )
+    parser.add_argument(
+        "--seed",
+        help="Seed for the random PoI accessibility values, defaults to the time",
+        type=float,
+        default=None,
+        required=False,
+    )
+    parser.add_argument(
+        "--distance_tables",
+        help="Routing profiles to precompute all pairs distance tables for",
+        nargs="*",
+        choices=list(routing_profiles.keys()),
+        default=[],
+        required=False,
+    )
+    parser.add_argument(
+        "--reachability_radii",
+        help="Walking distances in feets to precompute the reachable edges and "
+        "PoIs of every node for, none to skip",
+        nargs="*",
+        type=float,
+        default=list(default_reachability_radii),
+        required=False,
+    )
+
     args = parser.parse_args()
 
     main(
@@ -135,4 +426,13 @@ if __name__ == "__main__":
         args.n0,
         parse_n1(args.n1),
         args.d_feets,
+        parse_references(args.references),
+        args.intermediate,
+        args.compact,
+        args.precision,
+        args.force,
+        args.workers,
+        args.seed,
+        args.distance_tables,
+        args.reachability_radii,
     )
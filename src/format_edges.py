@@ -1,5 +1,4 @@
-import json
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 from graph import edge_default_features as default_features
 
 
@@ -13,29 +12,21 @@ def format_features(features: Dict[str, Any]) -> Dict[str, Any]:
     return features
 
 
-def format_edges(src_dir: str) -> None:
-    with open(f"{src_dir}/edges.json", "r") as f:
-        edges = json.load(f)
+def format_edges(
+    edges: Dict[str, List[Dict[str, Any]]]
+) -> Tuple[List[Tuple[int, int]], Dict[str, List[int]], List[Dict[str, Any]]]:
+    res_edges: List[Tuple[int, int]] = list()
+    res_streets: Dict[str, List[int]] = dict()
+    res_features: List[Dict[str, Any]] = list()
 
-    res_edges = list()
-    res_streets = dict()
-    res_features = list()
-
-    for s_name, edges in edges.items():
+    for s_name, street_edges in edges.items():
         s_edges = list()
 
-        for edge in edges:
+        for edge in street_edges:
             res_features.append(format_features(edge["features"]))
             res_edges.append((edge["node1"], edge["node2"]))
             s_edges.append(len(res_edges) - 1)
 
         res_streets[s_name] = s_edges
 
-    with open(f"{src_dir}/{src_dir}_out/edges.json", "w") as f:
-        json.dump(res_edges, f, indent=4)
-
-    with open(f"{src_dir}/{src_dir}_out/streets.json", "w") as f:
-        json.dump(res_streets, f, indent=4)
-
-    with open(f"{src_dir}/{src_dir}_out/edges_features.json", "w") as f:
-        json.dump(res_features, f, indent=4)
+    return res_edges, res_streets, res_features
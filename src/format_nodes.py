@@ -1,7 +1,6 @@
-import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
-from graph import Coords, GraphEncoder, Node
+from graph import Coords, Node
 from graph import node_default_features as default_features
 
 
@@ -23,11 +22,10 @@ def format_features(features: Dict[str, Any]) -> Dict[str, Any]:
     return features
 
 
-def format_nodes(src_dir: str, n0_index: int, n1_index: int, d_feets: float) -> float:
-    with open(f"{src_dir}/nodes.json", "r") as f:
-        nodes = json.load(f)
-
-    res_nodes = list()
+def format_nodes(
+    nodes: List[Dict[str, Any]], n0_index: int, n1_index: int, d_feets: float
+) -> Tuple[List[Coords], List[Dict[str, Any]], float]:
+    res_nodes: List[Coords] = list()
 
     n0 = get_node(nodes[n0_index])
     n1 = get_node(nodes[n1_index])
@@ -43,10 +41,4 @@ def format_nodes(src_dir: str, n0_index: int, n1_index: int, d_feets: float) ->
         res_nodes.append(node.coords * feets_per_pixes)
         res_features.append(format_features(node.features))
 
-    with open(f"{src_dir}/{src_dir}_out/nodes.json", "w") as f:
-        json.dump(res_nodes, f, indent=4, cls=GraphEncoder)
-
-    with open(f"{src_dir}/{src_dir}_out/nodes_features.json", "w") as f:
-        json.dump(res_features, f, indent=4, cls=GraphEncoder)
-
-    return feets_per_pixes
+    return res_nodes, res_features, feets_per_pixes
@@ -1,34 +1,69 @@
-import json
+import io
+import multiprocessing
+import multiprocessing.pool
 import random
+import numpy as np
 import time
-from typing import Any, Dict, List, Optional, Set
-import re
-from datetime import datetime
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+from contextlib import redirect_stdout
 
 from graph import (
+    AffineGeoreference,
     Coords,
+    DescriptionTable,
     Edge,
-    load_graph,
-    latlng_to_coords,
-    LatLngReference,
-    GraphEncoder,
+    EdgeGeometry,
+    EdgeIndex,
+    Graph,
 )
+from categories import format_categories
+from feature_stream import read_properties
+from opening_hours import format_opening_hours, opening_intervals
+from proximity import describe_conflict, find_conflicts
 from utils import *
 
+POI_BATCH_SIZE = 1024
+
 seed = time.time()
 random.seed(seed)
 print(f"Seed: {seed}")
 
 
-def get_edge(edges: List[Edge], coords: Coords) -> Edge:
-    edge = min(
-        filter(
-            lambda edge: edge.contains(coords.project_on(edge)),
-            edges,
-        ),
-        key=lambda edge: coords.distance_to_line(edge),
+def locate_pois(
+    geometry: EdgeGeometry,
+    georeference: AffineGeoreference,
+    pois: List[Dict[str, Any]],
+) -> List[Optional[Tuple[Coords, Edge]]]:
+    located: List[Optional[Tuple[Coords, Edge]]] = [None] * len(pois)
+
+    to_locate = [
+        i for i, poi in enumerate(pois) if "name" in poi and "street" in poi
+    ]
+    latlngs = np.array(
+        [(pois[i]["lat"], pois[i]["lon"]) for i in to_locate], dtype=np.float64
+    )
+    coords = georeference.to_coords(latlngs)
+
+    edges, _ = geometry.nearest_containing(
+        coords, [pois[i]["street"] for i in to_locate]
     )
-    return edge
+
+    for i, (x, y), edge_index in zip(to_locate, coords.tolist(), edges):
+        if edge_index >= 0:
+            located[i] = (Coords(x, y), geometry.edges[edge_index])
+
+    return located
 
 
 keys_to_remove = [
@@ -64,44 +99,6 @@ keys_to_remove = [
     "lon",
 ]
 
-public_transports = {
-    "train": "station",
-    "subway": "station",
-    "bus": "stop",
-    "tram": "stop",
-}
-
-
-def format_categories(categories: List[str]) -> List[str]:
-    res: Set[str] = set()
-    freq: Dict[str, int] = dict()
-
-    for category in categories:
-        fields = category.split(".")
-        freq[fields[0]] = freq.get(fields[0], 0) + 1
-
-    for category in categories:
-        fields = category.split(".")
-
-        if category.startswith("wheelchair") or category.startswith("internet_access"):
-            continue
-
-        tmp = ""
-        for i in range(len(fields) - 1):
-            tmp += fields[i]
-            if tmp in res:
-                res.remove(tmp)
-            tmp += "."
-
-        if fields[-1] in public_transports.keys():
-            res.add(f"{fields[-1]}_{public_transports[fields[-1]]}")
-            res.add("public_transport")
-        elif len(list(filter(lambda x: x.startswith(category), res))) == 0:
-            res.add(category)
-
-    return list(res)
-
-
 poi_accessibility_defaults = {
     "wheelchair_accessible": False,
     "tactile_paving": False,
@@ -128,9 +125,12 @@ poi_accessibility_values_office = {
 }
 
 
-def format_facilities(facilities: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    facilities = {k.replace(" ", "_"): v for k, v in facilities.items()}
+def normalize_keys(d: Dict[str, Any]) -> Dict[str, Any]:
+    return {k.replace(" ", "_"): v for k, v in d.items()}
 
+
+def filter_facilities(facilities: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # facilities must have normalized keys
     if "wheelchair" in facilities:
         del facilities["wheelchair"]
     if "wheelchair_details" in facilities:
@@ -145,12 +145,17 @@ def format_facilities(facilities: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     return facilities
 
 
-def format_accessibility(
-    categories: List[str], accessibility: Dict[str, Any], facilities: Dict[str, Any]
-) -> Dict[str, Any]:
-    facilities = {k.replace(" ", "_"): v for k, v in facilities.items()}
-    accessibility = {k.replace(" ", "_"): v for k, v in accessibility.items()}
+def format_facilities(facilities: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return filter_facilities(normalize_keys(facilities))
 
+
+def fill_accessibility(
+    categories: List[str],
+    accessibility: Dict[str, Any],
+    facilities: Dict[str, Any],
+    rng: Optional[random.Random] = None,
+) -> Dict[str, Any]:
+    # accessibility and facilities must have normalized keys
     if "wheelchair" in facilities:
         accessibility["wheelchair_accessible"] = facilities["wheelchair"]
     if "wheelchair_details" in facilities:
@@ -160,173 +165,326 @@ def format_accessibility(
 
     for key in poi_accessibility_defaults.keys():
         if key in accessibility:
-            accessibility[key] = accessibility[key]
+            continue
         elif key in facilities:
             accessibility[key] = facilities[key]
         else:
-            accessibility[key] = get_random_accessibility_values(categories, key)
+            accessibility[key] = get_random_accessibility_values(
+                categories, key, rng
+            )
 
     return accessibility
 
 
-def get_random_accessibility_values(categories: List[str], key: str) -> Any:
+def format_accessibility(
+    categories: List[str],
+    accessibility: Dict[str, Any],
+    facilities: Dict[str, Any],
+    rng: Optional[random.Random] = None,
+) -> Dict[str, Any]:
+    return fill_accessibility(
+        categories, normalize_keys(accessibility), normalize_keys(facilities), rng
+    )
+
+
+def get_random_accessibility_values(
+    categories: List[str], key: str, rng: Optional[random.Random] = None
+) -> Any:
+    choice = random.choice if rng is None else rng.choice
     categories = [category.split(".")[0] for category in categories]
 
     if "catering" in categories or "commercial" in categories:
-        return random.choice(poi_accessibility_values_commercial[key])
+        return choice(poi_accessibility_values_commercial[key])
 
     if "office" in categories or "education" in categories:
-        return random.choice(poi_accessibility_values_office[key])
+        return choice(poi_accessibility_values_office[key])
 
     return poi_accessibility_defaults[key]
 
 
-def format_opening_hours(opening_hours: str) -> str:
-    def convert_to_am_pm(time_24h):
-        time_obj = datetime.strptime(time_24h, "%H:%M")
-        return time_obj.strftime("%I:%M %p").lstrip("0")
-
-    if "24/7" in opening_hours:
-        return "Open 24 hours, 7 days a week"
-
-    try:
-        pattern = r"(\w+(?:-\w+)?(?:,\w+(?:-\w+)?)*)?\s*(\d{2}:\d{2})-(\d{2}:\d{2})"
-        matches = re.findall(pattern, opening_hours)
-
-        if not matches:
-            raise Exception("No matches found")
-
-        result = []
-
-        for match in matches:
-            days = match[0].strip() if match[0] else ""
-            start_time = convert_to_am_pm(match[1])
-            end_time = convert_to_am_pm(match[2])
-
-            if days:
-                result.append(f"{days} {start_time} - {end_time}")
+class PoiTransform:
+    # Compiles a declarative spec once, then applies it in place to every
+    # PoI visiting only the keys that have an action:
+    #   remove: keys dropped
+    #   move: key -> (dict key, nested key), moved into a nested dict
+    #   format: key -> function applied to the value
+    #   normalize: dict values whose keys get spaces replaced by "_"
+    MOVE = 0
+    FORMAT = 1
+    NORMALIZE = 2
+
+    def __init__(self, spec: Dict[str, Any]) -> None:
+        self.removed = frozenset(spec.get("remove", list()))
+        self.actions: Dict[str, Tuple[int, Any]] = dict()
+
+        for key, target in spec.get("move", dict()).items():
+            self.actions[key] = (PoiTransform.MOVE, target)
+        for key, fn in spec.get("format", dict()).items():
+            self.actions[key] = (PoiTransform.FORMAT, fn)
+        for key in spec.get("normalize", list()):
+            self.actions[key] = (PoiTransform.NORMALIZE, None)
+
+    def __call__(self, poi: Dict[str, Any]) -> Dict[str, Any]:
+        for key in self.removed.intersection(poi):
+            del poi[key]
+
+        # Replaced values keep their position, moves follow the PoI order
+        actions = self.actions
+        for key in [key for key in poi if key in actions]:
+            kind, arg = actions[key]
+            if kind == PoiTransform.FORMAT:
+                poi[key] = arg(poi[key])
+            elif kind == PoiTransform.NORMALIZE:
+                poi[key] = normalize_keys(poi[key])
             else:
-                result.append(f"{start_time} - {end_time}")
+                target, nested_key = arg
+                if target not in poi:
+                    poi[target] = dict()
+                poi[target][nested_key] = poi.pop(key)
+
+        return poi
+
+
+poi_transform = PoiTransform(
+    {
+        "remove": keys_to_remove,
+        "move": {"website": ("contact", "website")},
+        "format": {
+            "categories": format_categories,
+            "opening_hours": format_opening_hours,
+        },
+        "normalize": ["accessibility", "facilities"],
+    }
+)
 
-    except Exception:
-        print(f"Could not parse opening hours: {opening_hours}")
-        return ""
 
-    return "; ".join(result)
+def poi_random(seed: float, index: int) -> random.Random:
+    # Depends only on the seed and the position of the PoI in pois.json, so
+    # the result does not change with the number of workers
+    return random.Random(f"{seed}-{index}")
 
 
-def format_pois(
-    src_dir: str,
-    feets_per_inch: float,
-    reference_node_index: int,
-    reference_node_lat: float,
-    reference_node_lon: float,
-) -> None:
-    poi_min_distance = POI_TO_POI_MIN_DISTANCE * feets_per_inch
-    node_min_distance = POI_TO_NODE_MIN_DISTANCE * feets_per_inch
-    edge_max_distance = POI_TO_EDGE_MAX_DISTANCE * feets_per_inch
-
-    with open(f"{src_dir}/pois.json", "r") as f:
-        pois = json.load(f)["features"]
-
-    nodes, edges, streets = load_graph(f"{src_dir}/{src_dir}_out")
-    reference_node = LatLngReference(
-        nodes[reference_node_index].coords,
-        reference_node_lat,
-        reference_node_lon,
+def format_poi(
+    poi: Dict[str, Any],
+    coords: Coords,
+    edge: Edge,
+    node_min_distance: float,
+    edge_max_distance: float,
+    rng: Optional[random.Random] = None,
+    descriptions: Optional[DescriptionTable] = None,
+) -> Dict[str, Any]:
+    poi["edge"] = edge.index
+    opening_hours = poi.get("opening_hours")
+    poi_transform(poi)
+
+    if opening_hours is not None:
+        intervals = opening_intervals(opening_hours)
+        if intervals is not None:
+            poi["opening_intervals"] = intervals
+
+    facilities = poi.get("facilities", dict())
+    poi["accessibility"] = fill_accessibility(
+        poi.get("categories", list()),
+        poi.get("accessibility", dict()),
+        facilities,
+        rng,
     )
 
-    edges_index = {(e[0].index, e[1].index): i for i, e in enumerate(edges)}
+    if "facilities" in poi:
+        poi["facilities"] = filter_facilities(facilities)
+        if poi["facilities"] is None:
+            del poi["facilities"]
 
-    res: List[Dict[str, Any]] = list()
-    done: Set[str] = set()
+    closest_node = min([edge[0], edge[1]], key=lambda node: node.distance_to(coords))
 
-    for i, poi in enumerate(pois):
-        poi = poi["properties"]
+    # The edge was located on the PoI street, so it is the street of both
+    # the edge and its nodes
+    if closest_node.distance_to(coords) < node_min_distance:
+        location_description = (
+            descriptions.node_position(closest_node.index, poi["street"])
+            if descriptions is not None
+            else closest_node.get_position_description(poi["street"])
+        )
+    else:
+        location_description = (
+            descriptions.edge_position(edge.index)
+            if descriptions is not None
+            else edge.get_position_description(poi["street"])
+        )
+    poi["location_description"] = location_description
 
-        if "name" not in poi:
-            print(f"Skipping POI without name at index {i}")
-            continue
+    if (distance := closest_node.distance_to(coords)) < node_min_distance:
+        direction = edge.versor
+        direction *= 1 if edge.node1 == closest_node else -1
+        coords = coords + direction * (node_min_distance - distance) * 3 / 2
 
-        if poi["name"] in done:
-            print(f"Skipping duplicate {poi['name']}")
-            continue
+    if (distance := coords.distance_to_line(edge)) > edge_max_distance:
+        direction = (coords.project_on(edge) - coords).normalized()
+        coords = coords + direction * (distance - edge_max_distance)
 
-        if "street" not in poi:
-            print(f"Skipping POI without street: {poi['name']}")
-            continue
+    poi["coords"] = coords
 
-        coords = latlng_to_coords(reference_node, Coords(poi["lat"], poi["lon"]))
+    return poi
 
-        try:
-            edge = get_edge(streets[poi["street"]], coords)
-            poi["edge"] = edges_index[(edge[0].index, edge[1].index)]
-        except Exception:
-            print(f"Could not find edge for {poi['name']}")
-            continue
 
-        for key in keys_to_remove:
-            if key in poi:
-                del poi[key]
+# State of a worker process, set once by init_worker
+worker_state: Dict[str, Any] = dict()
 
-        if "categories" in poi:
-            poi["categories"] = format_categories(poi["categories"])
+FormatTask = Tuple[int, Dict[str, Any], Tuple[float, float], int]
 
-        if "website" in poi:
-            if "contact" not in poi:
-                poi["contact"] = dict()
-            poi["contact"]["website"] = poi["website"]
-            del poi["website"]
 
-        poi["accessibility"] = format_accessibility(
-            poi.get("categories", list()),
-            poi.get("accessibility", dict()),
-            poi.get("facilities", dict()),
+def init_worker(
+    graph: Graph, node_min_distance: float, edge_max_distance: float, seed: float
+) -> None:
+    worker_state["edges"] = graph.edges
+    worker_state["descriptions"] = graph.descriptions
+    worker_state["node_min_distance"] = node_min_distance
+    worker_state["edge_max_distance"] = edge_max_distance
+    worker_state["seed"] = seed
+
+
+def format_poi_task(task: FormatTask) -> Tuple[Dict[str, Any], str]:
+    # Messages are returned instead of printed, the parent prints them in order
+    i, poi, (x, y), edge = task
+
+    output = io.StringIO()
+    with redirect_stdout(output):
+        poi = format_poi(
+            poi,
+            Coords(x, y),
+            worker_state["edges"][edge],
+            worker_state["node_min_distance"],
+            worker_state["edge_max_distance"],
+            poi_random(worker_state["seed"], i),
+            worker_state["descriptions"],
         )
 
-        if "facilities" in poi:
-            poi["facilities"] = format_facilities(poi["facilities"])
-            if poi["facilities"] is None:
-                del poi["facilities"]
+    return poi, output.getvalue()
 
-        if "opening_hours" in poi:
-            poi["opening_hours"] = format_opening_hours(poi["opening_hours"])
 
-        closest_node = min(
-            [edge[0], edge[1]], key=lambda node: node.distance_to(coords)
-        )
+def read_pois(path: str) -> Iterator[Dict[str, Any]]:
+    # Drops the unused keys while reading, lat and lon are dropped by
+    # format_poi once the PoI has been located
+    return read_properties(
+        path, [key for key in keys_to_remove if key not in ("lat", "lon")]
+    )
 
-        if closest_node.distance_to(coords) < node_min_distance:
-            location_description = closest_node.get_position_description(poi["street"])
-        else:
-            location_description = edge.get_position_description(poi["street"])
-        poi["location_description"] = location_description
 
-        if (distance := closest_node.distance_to(coords)) < node_min_distance:
-            direction = edge.versor
-            direction *= 1 if edge.node1 == closest_node else -1
-            coords = coords + direction * (node_min_distance - distance) * 3 / 2
+def format_pois(
+    pois: Iterable[Dict[str, Any]],
+    graph: Graph,
+    feets_per_inch: float,
+    georeference: AffineGeoreference,
+    workers: int = 1,
+    random_seed: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    node_min_distance = POI_TO_NODE_MIN_DISTANCE * feets_per_inch
+    edge_max_distance = POI_TO_EDGE_MAX_DISTANCE * feets_per_inch
+
+    if random_seed is None:
+        random_seed = seed
 
-        if (distance := coords.distance_to_line(edge)) > edge_max_distance:
-            direction = (coords.project_on(edge) - coords).normalized()
-            coords = coords + direction * (distance - edge_max_distance)
+    geometry = EdgeGeometry(graph.edges, EdgeIndex(graph.edges))
 
-        poi["coords"] = coords
+    res: List[Dict[str, Any]] = list()
+    done: Set[str] = set()
 
-        res.append(poi)
-        done.add(poi["name"])
+    def format_batch(
+        batch: List[Dict[str, Any]],
+        start: int,
+        pool: Optional[multiprocessing.pool.Pool],
+    ) -> None:
+        located = locate_pois(geometry, georeference, batch)
+
+        # Skip messages and indexes of the PoIs to format, in pois.json order
+        events: List[Union[str, int]] = list()
+        tasks: List[FormatTask] = list()
+
+        for i, poi in enumerate(batch, start):
+            if "name" not in poi:
+                events.append(f"Skipping POI without name at index {i}")
+                continue
+
+            if poi["name"] in done:
+                events.append(f"Skipping duplicate {poi['name']}")
+                continue
+
+            if "street" not in poi:
+                events.append(f"Skipping POI without street: {poi['name']}")
+                continue
+
+            if (location := located[i - start]) is None:
+                events.append(f"Could not find edge for {poi['name']}")
+                continue
+
+            coords, edge = location
+            events.append(i)
+            tasks.append((i, poi, (coords.x, coords.y), edge.index))
+            done.add(poi["name"])
+
+        if pool is not None:
+            chunksize = max(1, len(tasks) // (workers * 8))
+            results = pool.imap(format_poi_task, tasks, chunksize)
+        else:
+            results = (
+                (
+                    format_poi(
+                        poi,
+                        Coords(x, y),
+                        graph.edges[edge],
+                        node_min_distance,
+                        edge_max_distance,
+                        poi_random(random_seed, i),
+                        graph.descriptions,
+                    ),
+                    "",
+                )
+                for i, poi, (x, y), edge in tasks
+            )
+
+        for event in events:
+            if isinstance(event, str):
+                print(event)
+                continue
+
+            poi, output = next(results)
+            print(output, end="")
+            res.append(poi)
+
+    def format_all(pool: Optional[multiprocessing.pool.Pool]) -> None:
+        # Raw PoIs are read and dropped POI_BATCH_SIZE at a time
+        batch: List[Dict[str, Any]] = list()
+        start = 0
+
+        for poi in pois:
+            batch.append(poi)
+            if len(batch) == POI_BATCH_SIZE:
+                format_batch(batch, start, pool)
+                start += len(batch)
+                batch = list()
+
+        if len(batch) > 0:
+            format_batch(batch, start, pool)
+
+    if workers > 1:
+        with multiprocessing.Pool(
+            workers,
+            initializer=init_worker,
+            initargs=(graph, node_min_distance, edge_max_distance, random_seed),
+        ) as pool:
+            format_all(pool)
+    else:
+        format_all(None)
 
     res.sort(key=lambda x: x["name"])
+    return res
 
-    for node in nodes:
-        for i, poi in enumerate(res):
-            if node.distance_to(poi["coords"]) < node_min_distance:
-                print(f"{poi['name']} ({i}) is too close to node {node.index}")
-
-    for i, poi in enumerate(res):
-        for j in range(i + 1, len(res)):
-            if res[j]["coords"].distance_to(poi["coords"]) < poi_min_distance:
-                print(f"{poi['name']} ({i}) is too close to {res[j]['name']} ({j})")
 
-    with open(f"{src_dir}/{src_dir}_out/pois.json", "w") as f:
-        json.dump(res, f, indent=4, cls=GraphEncoder)
+def describe_conflicts(
+    pois: Sequence[Dict[str, Any]], graph: Graph, feets_per_inch: float
+) -> List[str]:
+    # PoIs placed by format_pois too close to a node or to each other
+    return [
+        describe_conflict(conflict, pois)
+        for conflict in find_conflicts(graph.nodes, pois, feets_per_inch)
+    ]
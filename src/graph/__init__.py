@@ -4,11 +4,51 @@ from .coords import (
     coords_to_latlng,
     latlng_to_coords,
     latlng_distance,
+    coords_to_latlngs,
+    latlngs_to_coords,
+    latlng_distances,
     LatLngReference,
 )
 from .edge import Edge, default_features as edge_default_features
 from .node import Node, default_features as node_default_features
-from .graph import load_graph
+from .graph import Graph, build_graph, load_graph
+from .binary import BINARY_GRAPH_FILE, save_graph
+from .spatial_index import EdgeIndex, PointIndex, UniformGrid
+from .geometry import EdgeGeometry
+from .georeference import AffineGeoreference
+from .descriptions import DescriptionTable
+from .distance_table import (
+    DISTANCE_TABLES_DIR,
+    MAX_TABLE_BYTES,
+    DistanceTable,
+    distance_table_size,
+    load_distance_table,
+)
+from .routing import (
+    PROFILES as routing_profiles,
+    ROUTING_FILE,
+    CostProfile,
+    Landmarks,
+    Route,
+    Router,
+    compute_distance_table,
+    compute_landmarks,
+    load_landmarks,
+    load_router,
+    save_distance_tables,
+    save_landmarks,
+)
+from .reachability import (
+    DEFAULT_RADII as default_reachability_radii,
+    REACHABILITY_FILE,
+    DeltaLists,
+    ReachabilityTable,
+    category_mask,
+    compute_reachability,
+    load_reachability,
+    save_reachability,
+)
+from .locator import BatchLocation, Location, Locator, load_locator
 from json import JSONEncoder
 from typing import Any
 
@@ -29,10 +69,52 @@ __all__ = [
     "Position",
     "Edge",
     "Node",
+    "Graph",
+    "build_graph",
     "load_graph",
+    "save_graph",
+    "BINARY_GRAPH_FILE",
+    "EdgeIndex",
+    "PointIndex",
+    "UniformGrid",
+    "EdgeGeometry",
+    "AffineGeoreference",
+    "DescriptionTable",
+    "DISTANCE_TABLES_DIR",
+    "MAX_TABLE_BYTES",
+    "DistanceTable",
+    "distance_table_size",
+    "load_distance_table",
+    "routing_profiles",
+    "ROUTING_FILE",
+    "CostProfile",
+    "Landmarks",
+    "Route",
+    "Router",
+    "compute_distance_table",
+    "compute_landmarks",
+    "load_landmarks",
+    "load_router",
+    "save_distance_tables",
+    "save_landmarks",
+    "default_reachability_radii",
+    "REACHABILITY_FILE",
+    "DeltaLists",
+    "ReachabilityTable",
+    "category_mask",
+    "compute_reachability",
+    "load_reachability",
+    "save_reachability",
+    "BatchLocation",
+    "Location",
+    "Locator",
+    "load_locator",
     "coords_to_latlng",
     "latlng_to_coords",
     "latlng_distance",
+    "coords_to_latlngs",
+    "latlngs_to_coords",
+    "latlng_distances",
     "edge_default_features",
     "node_default_features",
     "GraphEncoder",
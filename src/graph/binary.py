@@ -0,0 +1,236 @@
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+import json
+import struct
+import numpy as np
+from .coords import Coords
+from .edge import Edge
+from .graph import Graph
+from .node import Node
+
+# Layout of a binary graph file:
+#   MAGIC | header length (uint64, little endian) | JSON header | padding |
+#   arrays, each one starting at a multiple of ALIGNMENT
+# The header stores street names, the interned feature tables and, for every
+# array, its dtype, shape and offset from the start of the arrays section.
+BINARY_GRAPH_FILE = "graph.bin"
+MAGIC = b"CAMIOGR\x01"
+ALIGNMENT = 64
+
+T = TypeVar("T")
+
+
+def align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def intern_features(
+    features: Sequence[Dict[str, Any]]
+) -> Tuple[List[str], np.ndarray]:
+    table: Dict[str, int] = dict()
+    ids = [table.setdefault(json.dumps(f), len(table)) for f in features]
+    return list(table.keys()), np.array(ids, dtype=np.int32)
+
+
+def save_graph(graph: Graph, path: str) -> None:
+    edges_position = {id(edge): i for i, edge in enumerate(graph.edges)}
+
+    street_edges: List[int] = list()
+    street_offsets = [0]
+    for street_name in graph.street_names:
+        street_edges.extend(
+            edges_position[id(edge)] for edge in graph.streets[street_name]
+        )
+        street_offsets.append(len(street_edges))
+
+    node_features_table, node_features = intern_features(
+        [node.features for node in graph.nodes]
+    )
+    edge_features_table, edge_features = intern_features(
+        [edge.features for edge in graph.edges]
+    )
+
+    arrays: Dict[str, np.ndarray] = {
+        "node_coords": np.array(
+            [(node.coords.x, node.coords.y) for node in graph.nodes],
+            dtype=np.float64,
+        ).reshape(-1, 2),
+        "node_features": node_features,
+        "edge_index": np.array([edge.index for edge in graph.edges], dtype=np.int32),
+        "edge_features": edge_features,
+        "street_offsets": np.array(street_offsets, dtype=np.int32),
+        "street_edges": np.array(street_edges, dtype=np.int32),
+        "edge_nodes": graph.edge_nodes,
+        "edge_street": graph.edge_street,
+        "node_edges_offsets": graph.node_edges_offsets,
+        "node_edges": graph.node_edges,
+        "node_streets_offsets": graph.node_streets_offsets,
+        "node_streets": graph.node_streets,
+    }
+
+    arrays_header: Dict[str, Dict[str, Any]] = dict()
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        arrays_header[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset = align(offset + array.nbytes)
+
+    header = json.dumps(
+        {
+            "street_names": graph.street_names,
+            "node_features": node_features_table,
+            "edge_features": edge_features_table,
+            "arrays": arrays_header,
+        }
+    ).encode("utf-8")
+
+    data_start = align(len(MAGIC) + 8 + len(header))
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+
+        for name, array in arrays.items():
+            f.write(b"\0" * (data_start + arrays_header[name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+
+
+class LazySequence(Sequence[T]):
+    # Materializes items on first access and caches them
+    def __init__(self, length: int, factory: Callable[[int], T]) -> None:
+        self.factory = factory
+        self.items: List[Optional[T]] = [None] * length
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        index = int(index)
+        if index < 0:
+            index += len(self.items)
+
+        item = self.items[index]
+        if item is None:
+            item = self.items[index] = self.factory(index)
+        return item
+
+    def __iter__(self) -> Iterator[T]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class LazyStreets(Mapping[str, List[Edge]]):
+    def __init__(
+        self,
+        street_names: List[str],
+        offsets: np.ndarray,
+        street_edges: np.ndarray,
+        edges: Sequence[Edge],
+    ) -> None:
+        self.street_ids = {name: i for i, name in enumerate(street_names)}
+        self.offsets = offsets
+        self.street_edges = street_edges
+        self.edges = edges
+        self.cache: Dict[str, List[Edge]] = dict()
+
+    def __getitem__(self, street: str) -> List[Edge]:
+        if street not in self.cache:
+            i = self.street_ids[street]
+            self.cache[street] = [
+                self.edges[edge]
+                for edge in self.street_edges[self.offsets[i] : self.offsets[i + 1]]
+            ]
+        return self.cache[street]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.street_ids)
+
+    def __len__(self) -> int:
+        return len(self.street_ids)
+
+
+class FeaturesTable:
+    def __init__(self, table: List[str]) -> None:
+        self.table = table
+        self.decoded: Dict[int, Dict[str, Any]] = dict()
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        index = int(index)
+        if index not in self.decoded:
+            self.decoded[index] = json.loads(self.table[index])
+        return dict(self.decoded[index])
+
+
+def load_binary_graph(path: str) -> Graph:
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+
+    if bytes(data[: len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a binary graph file")
+
+    (header_length,) = struct.unpack_from("<Q", data, len(MAGIC))
+    header_start = len(MAGIC) + 8
+    header = json.loads(bytes(data[header_start : header_start + header_length]))
+    data_start = align(header_start + header_length)
+
+    arrays: Dict[str, np.ndarray] = dict()
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        arrays[name] = np.frombuffer(
+            data, dtype=dtype, count=count, offset=data_start + spec["offset"]
+        ).reshape(spec["shape"])
+
+    street_names: List[str] = header["street_names"]
+    node_features = FeaturesTable(header["node_features"])
+    edge_features = FeaturesTable(header["edge_features"])
+
+    def get_node(i: int) -> Node:
+        x, y = arrays["node_coords"][i]
+        node = Node(
+            i,
+            Coords(float(x), float(y)),
+            features=node_features[arrays["node_features"][i]],
+        )
+
+        offsets = arrays["node_edges_offsets"]
+        for edge in arrays["node_edges"][offsets[i] : offsets[i + 1]]:
+            node.add_street(street_names[arrays["edge_street"][edge]])
+
+        return node
+
+    def get_edge(i: int) -> Edge:
+        node1, node2 = arrays["edge_nodes"][i]
+        return Edge(
+            nodes[node1],
+            nodes[node2],
+            street_names[arrays["edge_street"][i]],
+            edge_features[arrays["edge_features"][i]],
+            index=int(arrays["edge_index"][i]),
+        )
+
+    nodes: LazySequence[Node] = LazySequence(len(arrays["node_coords"]), get_node)
+    edges: LazySequence[Edge] = LazySequence(len(arrays["edge_nodes"]), get_edge)
+    streets = LazyStreets(
+        street_names, arrays["street_offsets"], arrays["street_edges"], edges
+    )
+
+    return Graph(nodes, edges, streets, arrays)
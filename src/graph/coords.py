@@ -1,9 +1,12 @@
-from typing import Union, Iterator
+from typing import Any, Iterator, Tuple, Union
 from abc import ABC, abstractmethod
 import math
+import numpy as np
 
 
 class StraightLine(ABC):
+    __slots__ = ()
+
     @property
     @abstractmethod
     def m(self) -> float:
@@ -16,6 +19,8 @@ class StraightLine(ABC):
 
 
 class Position(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def distance_to(self, coords: "Coords") -> float:
         pass
@@ -30,16 +35,20 @@ class Position(ABC):
 
 
 class Coords(Position):
+    __slots__ = ("x", "y")
+
     def __init__(self, x: float, y: float) -> None:
-        self.coords = (x, y)
+        _set_x(self, x)
+        _set_y(self, y)
 
-    @property
-    def x(self) -> float:
-        return self.coords[0]
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Coords are immutable")
 
-    @property
-    def y(self) -> float:
-        return self.coords[1]
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("Coords are immutable")
+
+    def __reduce__(self) -> Tuple[type, Tuple[float, float]]:
+        return (Coords, (self.x, self.y))
 
     def closest_point(self, coords: "Coords") -> "Coords":
         return self
@@ -50,27 +59,42 @@ class Coords(Position):
     def distance_to(self, coords: "Coords") -> float:
         return float(((self.x - coords.x) ** 2 + (self.y - coords.y) ** 2) ** 0.5)
 
+    def distance_squared_to(self, coords: "Coords") -> float:
+        dx = self.x - coords.x
+        dy = self.y - coords.y
+        return dx * dx + dy * dy
+
     def manhattan_distance_to(self, other: "Coords") -> float:
         return abs(self.x - other.x) + abs(self.y - other.y)
 
     def distance_to_line(self, line: StraightLine) -> float:
-        if math.isinf(line.m):
-            return abs(self.x - line.q)
+        m = line.m
+        q = line.q
 
-        num = abs(line.m * self.x + line.q - self.y)
-        den = (line.m**2 + 1) ** 0.5
+        if math.isinf(m):
+            return abs(self.x - q)
+
+        num = abs(m * self.x + q - self.y)
+        den = (m**2 + 1) ** 0.5
 
         return float(num / den)
 
     def project_on(self, line: StraightLine) -> "Coords":
-        if math.isinf(line.m):
-            return Coords(line.q, self.y)
+        m = line.m
+        q = line.q
+
+        if math.isinf(m):
+            return Coords(q, self.y)
 
-        p_x = (self.x + line.m * self.y - line.m * line.q) / (line.m**2 + 1)
-        p_y = (line.m * self.x + line.m**2 * self.y + line.q) / (line.m**2 + 1)
+        p_x = (self.x + m * self.y - m * q) / (m**2 + 1)
+        p_y = (m * self.x + m**2 * self.y + q) / (m**2 + 1)
 
         return Coords(p_x, p_y)
 
+    def projection_factor(self, origin: "Coords", direction: "Coords") -> float:
+        # Same as direction.dot(self - origin), without the intermediate Coords
+        return (self.x - origin.x) * direction.x + (self.y - origin.y) * direction.y
+
     def dot(self, other: "Coords") -> float:
         return self.x * other.x + self.y * other.y
 
@@ -78,7 +102,7 @@ class Coords(Position):
         return self.x * other.y - self.y * other.x
 
     def length(self) -> float:
-        return self.distance_to(ZERO)
+        return float((self.x**2 + self.y**2) ** 0.5)
 
     def normalized(self) -> "Coords":
         return self / self.length()
@@ -103,11 +127,26 @@ class Coords(Position):
         return Coords(self.x // other, self.y // other)
 
     def __getitem__(self, index: int) -> float:
-        return self.coords[index]
+        if index == 0:
+            return self.x
+        if index == 1:
+            return self.y
+        return (self.x, self.y)[index]
 
     def __iter__(self) -> Iterator[float]:
         return iter((self.x, self.y))
 
+    def __len__(self) -> int:
+        return 2
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Coords):
+            return NotImplemented
+        return self.x == other.x and self.y == other.y
+
+    def __hash__(self) -> int:
+        return hash((self.x, self.y))
+
     def __str__(self) -> str:
         return f"({self.x}, {self.y})"
 
@@ -118,6 +157,10 @@ class Coords(Position):
         return str(self)
 
 
+# Slot setters, used to initialize Coords despite __setattr__ being disabled
+_set_x = Coords.x.__set__  # type: ignore
+_set_y = Coords.y.__set__  # type: ignore
+
 ZERO = Coords(0, 0)
 INF = Coords(math.inf, math.inf)
 
@@ -175,3 +218,63 @@ def latlng_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float
 
     c = 2 * math.asin(math.sqrt(a))
     return R * c
+
+
+# Batch versions of the functions above. They take and return (N, 2) arrays
+# of [x, y] coords or [lat, lng] pairs and agree with the scalar versions to
+# within BATCH_TOLERANCE feets / degrees (the only difference is the order of
+# floating point operations).
+BATCH_TOLERANCE = 1e-6
+
+
+def coords_to_latlngs(
+    latlng_reference: LatLngReference, coords: np.ndarray
+) -> np.ndarray:
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+
+    de = coords[:, 0] - latlng_reference.coords.x
+    dn = -(coords[:, 1] - latlng_reference.coords.y)
+
+    dLat = dn / R
+    dLon = de / (R * math.cos(math.pi * latlng_reference.lat / 180))
+
+    res = np.empty_like(coords)
+    res[:, 0] = latlng_reference.lat + dLat * 180 / math.pi
+    res[:, 1] = latlng_reference.lng + dLon * 180 / math.pi
+    return res
+
+
+def latlngs_to_coords(reference: LatLngReference, latlngs: np.ndarray) -> np.ndarray:
+    latlngs = np.asarray(latlngs, dtype=np.float64).reshape(-1, 2)
+    lats, lngs = latlngs[:, 0], latlngs[:, 1]
+
+    dx = latlng_distances(reference.lat, reference.lng, reference.lat, lngs)
+    dy = latlng_distances(reference.lat, reference.lng, lats, reference.lng)
+
+    dy = np.where(reference.lat > lats, -dy, dy)
+    dx = np.where(reference.lng > lngs, -dx, dx)
+
+    res = np.empty_like(latlngs)
+    res[:, 0] = reference.coords.x + dx
+    res[:, 1] = reference.coords.y - dy
+    return res
+
+
+def latlng_distances(
+    lat1: Union[float, np.ndarray],
+    lng1: Union[float, np.ndarray],
+    lat2: Union[float, np.ndarray],
+    lng2: Union[float, np.ndarray],
+) -> np.ndarray:
+    lat1 = np.radians(lat1)
+    lng1 = np.radians(lng1)
+    lat2 = np.radians(lat2)
+    lng2 = np.radians(lng2)
+
+    dLat = lat2 - lat1
+    dLon = lng2 - lng1
+
+    a = np.sin(dLat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dLon / 2) ** 2
+
+    c = 2 * np.arcsin(np.sqrt(a))
+    return R * c
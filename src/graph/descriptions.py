@@ -0,0 +1,79 @@
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from .graph import Graph
+
+
+class DescriptionTable:
+    # Position descriptions of every node, for each of its streets, and of
+    # every edge, on its street. Each distinct string is stored once in
+    # strings, nodes and edges refer to it by index.
+    def __init__(
+        self,
+        strings: List[str],
+        nodes: List[Dict[str, Tuple[int, int]]],
+        edges: List[int],
+    ) -> None:
+        self.strings = strings
+        self.nodes = nodes  # street -> (position, description) ids
+        self.edges = edges  # position id
+
+    @staticmethod
+    def build(graph: "Graph") -> "DescriptionTable":
+        ids: Dict[str, int] = dict()
+
+        def add(string: str) -> int:
+            return ids.setdefault(string, len(ids))
+
+        nodes = [
+            {
+                street: (
+                    add(node.get_position_description(street)),
+                    add(node.description(street)),
+                )
+                for street in node.streets
+            }
+            for node in graph.nodes
+        ]
+        edges = [
+            add(edge.get_position_description(edge.street)) for edge in graph.edges
+        ]
+
+        return DescriptionTable(list(ids.keys()), nodes, edges)
+
+    def node_position(self, node: int, street: str) -> str:
+        # Same as graph.nodes[node].get_position_description(street)
+        return self.strings[self.nodes[node][street][0]]
+
+    def node_description(self, node: int, street: str) -> str:
+        # Same as graph.nodes[node].description(street)
+        return self.strings[self.nodes[node][street][1]]
+
+    def edge_position(self, edge: int) -> str:
+        # Same as graph.edges[edge].get_position_description on its street
+        return self.strings[self.edges[edge]]
+
+    def to_json(self, street_names: Sequence[str]) -> Dict[str, Any]:
+        # Streets are stored as their index in street_names
+        street_ids = {name: i for i, name in enumerate(street_names)}
+        return {
+            "strings": self.strings,
+            "nodes": [
+                [[street_ids[street], *ids] for street, ids in node.items()]
+                for node in self.nodes
+            ],
+            "edges": self.edges,
+        }
+
+    @staticmethod
+    def from_json(
+        data: Dict[str, Any], street_names: Sequence[str]
+    ) -> "DescriptionTable":
+        nodes = [
+            {
+                street_names[street]: (position, description)
+                for street, position, description in node
+            }
+            for node in data["nodes"]
+        ]
+        return DescriptionTable(data["strings"], nodes, data["edges"])
@@ -0,0 +1,61 @@
+import os
+from typing import List, Optional
+import numpy as np
+
+DISTANCE_TABLES_DIR = "distances"
+MAX_TABLE_BYTES = 64 * 2**20  # per profile
+
+
+def next_hop_dtype(nodes: int) -> np.dtype:
+    return np.dtype(np.int16 if nodes <= np.iinfo(np.int16).max else np.int32)
+
+
+def distance_table_size(nodes: int) -> int:
+    # Bytes taken by the table of a graph with that many nodes
+    itemsize = np.dtype(np.float32).itemsize + next_hop_dtype(nodes).itemsize
+    return nodes * nodes * itemsize
+
+
+class DistanceTable:
+    # All pairs costs of a cost profile: distances[s, t] is the cost of the
+    # cheapest route from s to t, inf if there is none, and next_hops[s, t]
+    # the node after s on it, -1 if there is none or s is t
+    def __init__(self, distances: np.ndarray, next_hops: np.ndarray) -> None:
+        self.distances = distances
+        self.next_hops = next_hops
+
+    def __len__(self) -> int:
+        return len(self.distances)
+
+    def distance(self, source: int, target: int) -> float:
+        return float(self.distances[source, target])
+
+    def path(self, source: int, target: int) -> Optional[List[int]]:
+        # Nodes of the cheapest route from source to target
+        if self.distances[source, target] == np.inf:
+            return None
+
+        nodes = [source]
+        while nodes[-1] != target:
+            nodes.append(int(self.next_hops[nodes[-1], target]))
+        return nodes
+
+
+def save_distance_table(path: str, name: str, table: DistanceTable) -> List[str]:
+    # Writes the table of the profile name in the directory path, returns
+    # the files written
+    if not os.path.exists(path):
+        os.makedirs(path)
+
+    files = [f"{path}/{name}.distances.npy", f"{path}/{name}.next_hops.npy"]
+    np.save(files[0], table.distances)
+    np.save(files[1], table.next_hops)
+    return files
+
+
+def load_distance_table(path: str, name: str) -> Optional[DistanceTable]:
+    # The arrays are memory-mapped, None if the table was not built
+    files = [f"{path}/{name}.distances.npy", f"{path}/{name}.next_hops.npy"]
+    if not all(os.path.exists(file) for file in files):
+        return None
+    return DistanceTable(*(np.load(file, mmap_mode="r") for file in files))
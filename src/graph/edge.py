@@ -30,41 +30,63 @@ class Edge(StraightLine, Position):
         node2: Node,
         street_name: str,
         features: Optional[Dict[str, Any]] = None,
+        index: int = -1,
     ) -> None:
         self.node1 = node1
         self.node2 = node2
         self.street = street_name
         self.features = features if features is not None else default_features
 
+        self.index = index  # position in the edges list of the graph, if any
+        self._id: Optional[str] = None
+        self._hash = hash((node1.index, node2.index))
+
         self.between_streets: Set[str] = set()
-        self.length = self.node1.distance_to(self.node2)
+
+        self.update_geometry()
+        node1.edges.append(self)
+        node2.edges.append(self)
+
+    def update_geometry(self) -> None:
+        # Called by the endpoints whenever their coords change
+        c1 = self.node1.coords
+        c2 = self.node2.coords
+
+        if c1.x == c2.x:
+            self._m = float("inf")
+            self._q = c1.x
+        else:
+            self._m = (c1.y - c2.y) / (c1.x - c2.x)
+            self._q = (c1.x * c2.y - c2.x * c1.y) / (c1.x - c2.x)
+
+        self._length = c1.distance_to(c2)
+        self._versor = (c2 - c1).normalized() if self._length > 0 else c2 - c1
 
     @property
     def id(self) -> str:
-        return f"{self.node1.id} - {self.node2.id}"
+        if self._id is None:
+            self._id = f"{self.node1.id} - {self.node2.id}"
+        return self._id
 
     @property
     def m(self) -> float:
-        if self.node1[0] == self.node2[0]:
-            return float("inf")
-
-        return (self.node1[1] - self.node2[1]) / (self.node1[0] - self.node2[0])
+        return self._m
 
     @property
     def q(self) -> float:
-        if self.node1[0] == self.node2[0]:
-            return self.node1[0]
+        return self._q
 
-        return (self.node1[0] * self.node2[1] - self.node2[0] * self.node1[1]) / (
-            self.node1[0] - self.node2[0]
-        )
+    @property
+    def length(self) -> float:
+        return self._length
 
     @property
     def versor(self) -> Coords:
-        return (self.node2.coords - self.node1.coords).normalized()
+        return self._versor
 
     def contains(self, coords: Coords) -> bool:
-        return 0 < self.versor.dot(coords - self.node1.coords) < self.length
+        t = coords.projection_factor(self.node1.coords, self._versor)
+        return 0 < t < self._length
 
     def is_adjacent(self, other: "Edge") -> bool:
         return (
@@ -88,10 +110,11 @@ class Edge(StraightLine, Position):
         if self.contains(projection):
             return projection
 
-        return min(
-            [self.node1, self.node2],
-            key=lambda node: node.distance_to(coords),
-        ).coords
+        if self.node2.coords.distance_squared_to(
+            coords
+        ) < self.node1.coords.distance_squared_to(coords):
+            return self.node2.coords
+        return self.node1.coords
 
     def get_position_description(self, street: str) -> str:
         location_description = (
@@ -112,15 +135,20 @@ class Edge(StraightLine, Position):
         return str(self)
 
     def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
         if not isinstance(other, Edge):
             return False
-        return self.node1 == other.node1 and self.node2 == other.node2
+        return (
+            self.node1.index == other.node1.index
+            and self.node2.index == other.node2.index
+        )
 
     def __iter__(self) -> Iterator[Node]:
         return iter((self.node1, self.node2))
 
     def __hash__(self) -> int:
-        return hash(self.id)
+        return self._hash
 
     def get_distance_description(self, coords: Coords) -> str:
         if not self.contains(coords):
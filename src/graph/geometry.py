@@ -0,0 +1,359 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from .edge import Edge
+from .spatial_index import EdgeIndex
+
+DEFAULT_CHUNK_SIZE = 1024
+MAX_CHUNK_ELEMENTS = 1 << 18  # points x edges evaluated at once
+
+EdgeSelection = Union[slice, np.ndarray]
+
+
+def as_points(points: Sequence[Sequence[float]]) -> np.ndarray:
+    if not isinstance(points, np.ndarray):
+        points = [tuple(point) for point in points]
+    array = np.asarray(points, dtype=np.float64)
+    return np.ascontiguousarray(array.reshape(-1, 2))
+
+
+def nearest_points(
+    points: np.ndarray,
+    targets: np.ndarray,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Index of the closest target to every point (-1 if there are no
+    # targets) and its distance (inf if there are no targets)
+    points = as_points(points)
+    targets = as_points(targets)
+
+    indexes = np.full(len(points), -1, dtype=np.int64)
+    distances = np.full(len(points), np.inf, dtype=np.float64)
+
+    if len(targets) == 0:
+        return indexes, distances
+
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start : start + chunk_size]
+        chunk_distances = np.hypot(
+            chunk[:, 0, np.newaxis] - targets[:, 0],
+            chunk[:, 1, np.newaxis] - targets[:, 1],
+        )
+
+        best = np.argmin(chunk_distances, axis=1)
+        indexes[start : start + len(chunk)] = best
+        distances[start : start + len(chunk)] = chunk_distances[
+            np.arange(len(chunk)), best
+        ]
+
+    return indexes, distances
+
+
+class EdgeGeometry:
+    # With an index, points filtered by street are first compared with the
+    # edges of their street in the 3x3 cells of the index around them, and
+    # only with all of them when an edge further away could be closer
+    def __init__(
+        self, edges: Sequence[Edge], index: Optional[EdgeIndex] = None
+    ) -> None:
+        self.edges = edges
+        self.index = index
+
+        endpoints = np.array(
+            [(e[0][0], e[0][1], e[1][0], e[1][1]) for e in edges],
+            dtype=np.float64,
+        ).reshape(-1, 4)
+
+        self.starts = np.ascontiguousarray(endpoints[:, :2])
+        self.ends = np.ascontiguousarray(endpoints[:, 2:])
+
+        delta = self.ends - self.starts
+        self.lengths = np.hypot(delta[:, 0], delta[:, 1])
+
+        safe_lengths = np.where(self.lengths > 0, self.lengths, 1.0)
+        self.versors = delta / safe_lengths[:, np.newaxis]
+
+        self.street_ids: Dict[str, int] = dict()
+        self.edges_street = np.array(
+            [self.street_ids.setdefault(e.street, len(self.street_ids)) for e in edges],
+            dtype=np.int32,
+        )
+
+        if index is not None:
+            self.cells_from_index(index)
+
+        # Edges of street i are street_order[street_offsets[i]:street_offsets[i + 1]]
+        self.street_order = np.argsort(self.edges_street, kind="stable")
+        self.street_offsets = np.searchsorted(
+            self.edges_street[self.street_order], np.arange(len(self.street_ids) + 1)
+        )
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    def cells_from_index(self, index: EdgeIndex) -> None:
+        # The edges of every cell of the index, sorted by street and cell so
+        # that those of a street in a cell are found with one search
+        cells = [(x, y, i) for (x, y), items in index.grid.cells.items() for i in items]
+        x, y, edges = np.array(cells, dtype=np.int64).reshape(-1, 3).T
+
+        self.cell_size = index.grid.cell_size
+        self.cells_origin = (x.min(initial=0), y.min(initial=0))
+        self.cells_shape = (
+            x.max(initial=0) - self.cells_origin[0] + 1,
+            y.max(initial=0) - self.cells_origin[1] + 1,
+        )
+
+        keys = self.cell_keys(self.edges_street[edges], x, y)
+        order = np.argsort(keys, kind="stable")
+        self.sorted_cell_keys = keys[order]
+        self.cell_edges = edges[order]
+
+    def cell_keys(
+        self, streets: np.ndarray, x: np.ndarray, y: np.ndarray
+    ) -> np.ndarray:
+        width, height = self.cells_shape
+        return (
+            streets.astype(np.int64) * width + (x - self.cells_origin[0])
+        ) * height + (y - self.cells_origin[1])
+
+    def projection_factors(self, points: np.ndarray) -> np.ndarray:
+        # Signed distance of each point's projection from each edge's node1,
+        # shape (N, M). A projection lies on the edge when 0 < t < length.
+        points = as_points(points)
+        dx = points[:, 0, np.newaxis] - self.starts[:, 0]
+        dy = points[:, 1, np.newaxis] - self.starts[:, 1]
+        return dx * self.versors[:, 0] + dy * self.versors[:, 1]
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        t = self.projection_factors(points)
+        return (0 < t) & (t < self.lengths)
+
+    def projections(self, points: np.ndarray) -> np.ndarray:
+        t = self.projection_factors(points)
+        return self.starts + t[:, :, np.newaxis] * self.versors
+
+    def line_distances(self, points: np.ndarray) -> np.ndarray:
+        points = as_points(points)
+        dx = points[:, 0, np.newaxis] - self.starts[:, 0]
+        dy = points[:, 1, np.newaxis] - self.starts[:, 1]
+        return np.abs(dx * self.versors[:, 1] - dy * self.versors[:, 0])
+
+    def distances(self, points: np.ndarray) -> np.ndarray:
+        points = as_points(points)
+        contained = self.contains(points)
+
+        nodes_distance = np.minimum(
+            self._endpoint_distances(points, self.starts),
+            self._endpoint_distances(points, self.ends),
+        )
+        return np.where(contained, self.line_distances(points), nodes_distance)
+
+    def closest_points(self, points: np.ndarray) -> np.ndarray:
+        points = as_points(points)
+        contained = self.contains(points)
+
+        closest_node = np.where(
+            (
+                self._endpoint_distances(points, self.starts)
+                <= self._endpoint_distances(points, self.ends)
+            )[:, :, np.newaxis],
+            self.starts,
+            self.ends,
+        )
+        return np.where(
+            contained[:, :, np.newaxis], self.projections(points), closest_node
+        )
+
+    def nearest(
+        self,
+        points: np.ndarray,
+        streets: Optional[Sequence[str]] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        return self._reduce(as_points(points), streets, chunk_size, False)
+
+    def nearest_containing(
+        self,
+        points: np.ndarray,
+        streets: Optional[Sequence[str]] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        return self._reduce(as_points(points), streets, chunk_size, True)
+
+    def _reduce_candidates(
+        self,
+        points: np.ndarray,
+        streets: Sequence[str],
+        containing: bool,
+        chunk_size: int,
+        indexes: np.ndarray,
+        distances: np.ndarray,
+    ) -> np.ndarray:
+        # Sets the result of the points whose best edge is among the
+        # candidates of the index and returns the others
+        points_street = np.array(
+            [self.street_ids.get(street, -1) for street in streets], dtype=np.int32
+        )
+        cells = np.floor(points / self.cell_size).astype(np.int64)
+
+        # Anything outside the 3x3 cells around a point is at least that far
+        bounds = np.minimum.reduce(
+            [
+                points[:, 0] - (cells[:, 0] - 1) * self.cell_size,
+                (cells[:, 0] + 2) * self.cell_size - points[:, 0],
+                points[:, 1] - (cells[:, 1] - 1) * self.cell_size,
+                (cells[:, 1] + 2) * self.cell_size - points[:, 1],
+            ]
+        )
+
+        offsets = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+        width, height = self.cells_shape
+        resolved = np.zeros(len(points), dtype=np.bool_)
+
+        for start, stop in self._chunks(len(points), chunk_size):
+            chunk = np.arange(start, stop)[points_street[start:stop] >= 0]
+            x = cells[chunk, 0, np.newaxis] + offsets[:, 0]
+            y = cells[chunk, 1, np.newaxis] + offsets[:, 1]
+            inside = (
+                (x >= self.cells_origin[0])
+                & (x < self.cells_origin[0] + width)
+                & (y >= self.cells_origin[1])
+                & (y < self.cells_origin[1] + height)
+            )
+
+            keys = self.cell_keys(points_street[chunk, np.newaxis], x, y)
+            first = np.searchsorted(self.sorted_cell_keys, keys, "left").ravel()
+            counts = np.where(
+                inside.ravel(),
+                np.searchsorted(self.sorted_cell_keys, keys, "right").ravel() - first,
+                0,
+            )
+
+            # One pair per candidate edge of every point of the chunk
+            pairs = np.repeat(np.repeat(chunk, len(offsets)), counts)
+            positions = np.arange(counts.sum()) + np.repeat(
+                first - (np.cumsum(counts) - counts), counts
+            )
+            edges = self.cell_edges[positions]
+            pairs_distances = self._pair_distances(
+                points[pairs, 0], points[pairs, 1], edges, containing
+            )
+
+            # Closest edge of every point, the lowest index on ties
+            order = np.lexsort((edges, pairs_distances, pairs))
+            best = order[np.unique(pairs[order], return_index=True)[1]]
+            found = best[pairs_distances[best] < bounds[pairs[best]]]
+
+            indexes[pairs[found]] = edges[found]
+            distances[pairs[found]] = pairs_distances[found]
+            resolved[pairs[found]] = True
+
+        return np.flatnonzero(~resolved)
+
+    def _groups(
+        self,
+        points: np.ndarray,
+        streets: Optional[Sequence[str]],
+        pending: np.ndarray,
+    ) -> List[Tuple[np.ndarray, EdgeSelection]]:
+        # Pending points and the edges they are compared with: all of them,
+        # or the edges of their street. Points of unknown streets are left out.
+        if streets is None:
+            return [(pending, slice(None))]
+
+        points_street = np.full(len(points), -1, dtype=np.int32)
+        points_street[pending] = [
+            self.street_ids.get(streets[i], -1) for i in pending.tolist()
+        ]
+        order = np.argsort(points_street, kind="stable")
+        bounds = np.searchsorted(
+            points_street[order], np.arange(len(self.street_ids) + 1)
+        )
+
+        return [
+            (
+                order[bounds[i] : bounds[i + 1]],
+                self.street_order[self.street_offsets[i] : self.street_offsets[i + 1]],
+            )
+            for i in range(len(self.street_ids))
+            if bounds[i] < bounds[i + 1]
+        ]
+
+    def _reduce(
+        self,
+        points: np.ndarray,
+        streets: Optional[Sequence[str]],
+        chunk_size: int,
+        containing: bool,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # Returns, for every point, the index of the best edge (-1 if none is
+        # allowed) and its distance (inf if none is allowed).
+        indexes = np.full(len(points), -1, dtype=np.int64)
+        distances = np.full(len(points), np.inf, dtype=np.float64)
+
+        if len(self) == 0 or len(points) == 0:
+            return indexes, distances
+
+        pending = np.arange(len(points))
+        if streets is not None and self.index is not None:
+            pending = self._reduce_candidates(
+                points, streets, containing, chunk_size, indexes, distances
+            )
+
+        for points_index, edges in self._groups(points, streets, pending):
+            edges_count = len(self) if isinstance(edges, slice) else len(edges)
+            rows = max(1, min(chunk_size, MAX_CHUNK_ELEMENTS // max(edges_count, 1)))
+
+            for start, stop in self._chunks(len(points_index), rows):
+                chunk = points_index[start:stop]
+                chunk_distances = self._pair_distances(
+                    points[chunk, 0, np.newaxis],
+                    points[chunk, 1, np.newaxis],
+                    edges,
+                    containing,
+                )
+
+                best = np.argmin(chunk_distances, axis=1)
+                best_distances = chunk_distances[np.arange(len(chunk)), best]
+                if not isinstance(edges, slice):
+                    best = edges[best]
+
+                indexes[chunk] = np.where(np.isfinite(best_distances), best, -1)
+                distances[chunk] = best_distances
+
+        return indexes, distances
+
+    def _pair_distances(
+        self, x: np.ndarray, y: np.ndarray, edges: EdgeSelection, containing: bool
+    ) -> np.ndarray:
+        # Distances of the points x, y to the edges, broadcast together. With
+        # containing, the distance to the line of the edges the projection of
+        # the point lies on and inf for the others, else to the segments.
+        starts, ends = self.starts[edges], self.ends[edges]
+        versors = self.versors[edges]
+
+        dx = x - starts[..., 0]
+        dy = y - starts[..., 1]
+        t = dx * versors[..., 0] + dy * versors[..., 1]
+        contained = (0 < t) & (t < self.lengths[edges])
+        line_distances = np.abs(dx * versors[..., 1] - dy * versors[..., 0])
+
+        if containing:
+            return np.where(contained, line_distances, np.inf)
+
+        nodes_distance = np.minimum(
+            np.hypot(dx, dy), np.hypot(x - ends[..., 0], y - ends[..., 1])
+        )
+        return np.where(contained, line_distances, nodes_distance)
+
+    @staticmethod
+    def _endpoint_distances(points: np.ndarray, endpoints: np.ndarray) -> np.ndarray:
+        return np.hypot(
+            points[:, 0, np.newaxis] - endpoints[:, 0],
+            points[:, 1, np.newaxis] - endpoints[:, 1],
+        )
+
+    @staticmethod
+    def _chunks(length: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+        for start in range(0, length, chunk_size):
+            yield start, min(start + chunk_size, length)
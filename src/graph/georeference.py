@@ -0,0 +1,108 @@
+from typing import Any, Dict, Optional, Sequence
+import math
+import numpy as np
+from .coords import LatLngReference, R, coords_to_latlngs, latlngs_to_coords
+
+
+def to_homogeneous(points: np.ndarray) -> np.ndarray:
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return np.hstack((points, np.ones((len(points), 1))))
+
+
+def invert_affine(matrix: np.ndarray) -> np.ndarray:
+    square = np.vstack((matrix, (0.0, 0.0, 1.0)))
+    return np.linalg.inv(square)[:2]
+
+
+class AffineGeoreference:
+    # Both matrices are 2x3: [x, y] = latlng_to_coords @ [lat, lng, 1] and
+    # [lat, lng] = coords_to_latlng @ [x, y, 1], with x, y in feets.
+    # Built from a single reference, points are converted with the batch
+    # functions of coords.py around it, the matrices only approximate them.
+    def __init__(
+        self,
+        latlng_to_coords: np.ndarray,
+        reference: Optional[LatLngReference] = None,
+    ) -> None:
+        self.latlng_to_coords = np.asarray(latlng_to_coords, dtype=np.float64)
+        if self.latlng_to_coords.shape != (2, 3):
+            raise ValueError("Expected a 2x3 affine matrix")
+
+        self.coords_to_latlng = invert_affine(self.latlng_to_coords)
+        self.reference = reference
+
+    @staticmethod
+    def from_reference(reference: LatLngReference) -> "AffineGeoreference":
+        # Tangent plane approximation of latlng_to_coords around the reference
+        feets_per_lat = R * math.pi / 180
+        feets_per_lng = feets_per_lat * math.cos(math.radians(reference.lat))
+
+        return AffineGeoreference(
+            np.array(
+                [
+                    [
+                        0.0,
+                        feets_per_lng,
+                        reference.coords.x - feets_per_lng * reference.lng,
+                    ],
+                    [
+                        -feets_per_lat,
+                        0.0,
+                        reference.coords.y + feets_per_lat * reference.lat,
+                    ],
+                ]
+            ),
+            reference,
+        )
+
+    @staticmethod
+    def fit(references: Sequence[LatLngReference]) -> "AffineGeoreference":
+        if len(references) < 3:
+            raise ValueError("At least 3 reference nodes are needed to fit a transform")
+
+        latlngs = np.array([(r.lat, r.lng) for r in references], dtype=np.float64)
+        coords = np.array(
+            [(r.coords.x, r.coords.y) for r in references], dtype=np.float64
+        )
+
+        # Center the data so that the system is well conditioned
+        latlngs_center = latlngs.mean(axis=0)
+        coords_center = coords.mean(axis=0)
+
+        solution, _, rank, _ = np.linalg.lstsq(
+            latlngs - latlngs_center, coords - coords_center, rcond=None
+        )
+        if rank < 2:
+            raise ValueError("Reference nodes must not be collinear")
+
+        linear = solution.T
+        translation = coords_center - linear @ latlngs_center
+
+        return AffineGeoreference(np.hstack((linear, translation[:, np.newaxis])))
+
+    def to_coords(self, latlngs: np.ndarray) -> np.ndarray:
+        if self.reference is not None:
+            return latlngs_to_coords(self.reference, latlngs)
+        return to_homogeneous(latlngs) @ self.latlng_to_coords.T
+
+    def to_latlngs(self, coords: np.ndarray) -> np.ndarray:
+        if self.reference is not None:
+            return coords_to_latlngs(self.reference, coords)
+        return to_homogeneous(coords) @ self.coords_to_latlng.T
+
+    def residuals(self, references: Sequence[LatLngReference]) -> np.ndarray:
+        latlngs = np.array([(r.lat, r.lng) for r in references], dtype=np.float64)
+        coords = np.array(
+            [(r.coords.x, r.coords.y) for r in references], dtype=np.float64
+        )
+        return np.hypot(*(self.to_coords(latlngs) - coords).T)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "latlng_to_coords": self.latlng_to_coords.tolist(),
+            "coords_to_latlng": self.coords_to_latlng.tolist(),
+        }
+
+    @staticmethod
+    def from_json(data: Dict[str, Any]) -> "AffineGeoreference":
+        return AffineGeoreference(np.array(data["latlng_to_coords"]))
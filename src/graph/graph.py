@@ -1,25 +1,177 @@
-from typing import Dict, List, Tuple
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 import json
+import os
+import numpy as np
 from .coords import Coords
+from .descriptions import DescriptionTable
 from .node import Node
 from .edge import Edge
 
 
-def load_graph(src_dir: str) -> Tuple[List[Node], List[Edge], Dict[str, List[Edge]]]:
-    with open(f"{src_dir}/nodes.json", "r") as f:
-        nodes_data = json.load(f)
-    with open(f"{src_dir}/nodes_features.json", "r") as f:
-        nodes_features = json.load(f)
+def to_csr(
+    rows: np.ndarray, values: np.ndarray, n_rows: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Groups values by row: the values of row i are
+    # values[offsets[i]:offsets[i + 1]], in their original order
+    order = np.argsort(rows, kind="stable")
+    offsets = np.zeros(n_rows + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=offsets[1:])
+    return offsets, np.ascontiguousarray(values[order], dtype=np.int32)
+
+
+class Graph:
+    # Edge ids are positions in self.edges, street ids positions in
+    # self.street_names. Adjacency is stored in CSR form: for node i,
+    # node_edges[node_edges_offsets[i]:node_edges_offsets[i + 1]] are its
+    # incident edges and node_streets[node_streets_offsets[i]:...] its
+    # distinct streets.
+    def __init__(
+        self,
+        nodes: Sequence[Node],
+        edges: Sequence[Edge],
+        streets: Mapping[str, List[Edge]],
+        arrays: Optional[Dict[str, np.ndarray]] = None,
+    ) -> None:
+        self.nodes = nodes
+        self.edges = edges
+        self.streets = streets
+
+        self.street_names = list(streets.keys())
+        self.street_ids = {name: i for i, name in enumerate(self.street_names)}
+
+        if arrays is None:
+            arrays = self.build_arrays()
+
+        self.edge_nodes = arrays["edge_nodes"]
+        self.edge_street = arrays["edge_street"]
+        self.node_edges_offsets = arrays["node_edges_offsets"]
+        self.node_edges = arrays["node_edges"]
+        self.node_streets_offsets = arrays["node_streets_offsets"]
+        self.node_streets = arrays["node_streets"]
+
+        self._descriptions: Optional[DescriptionTable] = None
+
+    @property
+    def descriptions(self) -> DescriptionTable:
+        # Built on first use, the strings only depend on the graph topology
+        if self._descriptions is None:
+            self._descriptions = DescriptionTable.build(self)
+        return self._descriptions
+
+    @descriptions.setter
+    def descriptions(self, descriptions: DescriptionTable) -> None:
+        # e.g. the table stored in model.json, so that it is not built again
+        self._descriptions = descriptions
+
+    def build_arrays(self) -> Dict[str, np.ndarray]:
+        arrays: Dict[str, np.ndarray] = dict()
+        streets_count = max(len(self.street_names), 1)
+
+        arrays["edge_nodes"] = np.array(
+            [(edge.node1.index, edge.node2.index) for edge in self.edges],
+            dtype=np.int32,
+        ).reshape(-1, 2)
+        arrays["edge_street"] = np.array(
+            [self.street_ids[edge.street] for edge in self.edges], dtype=np.int32
+        )
+
+        edge_ids = np.arange(len(self.edges), dtype=np.int32)
+        arrays["node_edges_offsets"], arrays["node_edges"] = to_csr(
+            arrays["edge_nodes"].ravel(), np.repeat(edge_ids, 2), len(self.nodes)
+        )
+
+        node_street = np.unique(
+            arrays["edge_nodes"].astype(np.int64) * streets_count
+            + np.repeat(arrays["edge_street"], 2).reshape(-1, 2)
+        )
+        arrays["node_streets_offsets"], arrays["node_streets"] = to_csr(
+            node_street // streets_count,
+            node_street % streets_count,
+            len(self.nodes),
+        )
+
+        return arrays
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Pickled as the data build_graph needs, Node and Edge reference each
+        # other and would otherwise be pickled recursively
+        return (
+            build_graph,
+            (
+                [node.coords for node in self.nodes],
+                [node.features for node in self.nodes],
+                [(edge.node1.index, edge.node2.index) for edge in self.edges],
+                {
+                    name: [edge.index for edge in edges]
+                    for name, edges in self.streets.items()
+                },
+                [edge.features for edge in self.edges],
+            ),
+        )
+
+    def __iter__(
+        self,
+    ) -> Iterator[Union[Sequence[Node], Sequence[Edge], Mapping[str, List[Edge]]]]:
+        # Allows `nodes, edges, streets = load_graph(...)`
+        return iter((self.nodes, self.edges, self.streets))
+
+    def incident_edges(self, node: int) -> np.ndarray:
+        return self.node_edges[
+            self.node_edges_offsets[node] : self.node_edges_offsets[node + 1]
+        ]
+
+    def node_street_ids(self, node: int) -> np.ndarray:
+        return self.node_streets[
+            self.node_streets_offsets[node] : self.node_streets_offsets[node + 1]
+        ]
+
+    def degree(self, node: int) -> int:
+        return int(self.node_edges_offsets[node + 1] - self.node_edges_offsets[node])
+
+    def streets_count(self, node: int) -> int:
+        return int(
+            self.node_streets_offsets[node + 1] - self.node_streets_offsets[node]
+        )
+
+    def is_intersection(self, node: int) -> bool:
+        return self.streets_count(node) > 1
+
+    def is_on_same_street(self, node1: int, node2: int) -> bool:
+        return self.nodes[node1].is_on_same_street(self.nodes[node2])
+
+    def edge_street_name(self, edge: int) -> str:
+        return self.street_names[self.edge_street[edge]]
+
+    def neighbours(self, node: int) -> Iterator[int]:
+        for edge in self.incident_edges(node):
+            node1, node2 = self.edge_nodes[edge]
+            yield int(node2) if node1 == node else int(node1)
+
+
+def build_graph(
+    nodes_coords: Sequence[Coords],
+    nodes_features: Sequence[Dict[str, Any]],
+    edges_data: Sequence[Tuple[int, int]],
+    streets_data: Mapping[str, List[int]],
+    edges_features: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+) -> Graph:
     nodes = [
-        Node(i, Coords(*data[0]), features=data[1])
-        for i, data in enumerate(zip(nodes_data, nodes_features))
+        Node(i, coords, features=features)
+        for i, (coords, features) in enumerate(zip(nodes_coords, nodes_features))
     ]
 
-    with open(f"{src_dir}/streets.json", "r") as f:
-        streets_data: Dict[str, List[int]] = json.load(f)
-
-    with open(f"{src_dir}/edges.json", "r") as f:
-        edges_data: List[Tuple[int, int]] = json.load(f)
+    if edges_features is None:
+        edges_features = [None] * len(edges_data)
 
     edges: List[Edge] = list()
     streets: Dict[str, List[Edge]] = dict()
@@ -31,14 +183,16 @@ def load_graph(src_dir: str) -> Tuple[List[Node], List[Edge], Dict[str, List[Edg
             edge_data = edges_data[edge_index]
 
             node1 = nodes[edge_data[0]]
-            node1.adjacents_streets.append(street_name)
+            node1.add_street(street_name)
             node2 = nodes[edge_data[1]]
-            node2.adjacents_streets.append(street_name)
+            node2.add_street(street_name)
 
             edge = Edge(
                 node1,
                 node2,
                 street_name,
+                edges_features[edge_index],
+                index=edge_index,
             )
 
             street_edges.append(edge)
@@ -46,4 +200,38 @@ def load_graph(src_dir: str) -> Tuple[List[Node], List[Edge], Dict[str, List[Edg
         edges.extend(street_edges)
         streets[street_name] = street_edges
 
-    return nodes, edges, streets
+    # Keep edge ids equal to their index in edges.json
+    edges.sort(key=lambda edge: edge.index)
+
+    return Graph(nodes, edges, streets)
+
+
+def load_graph(src_dir: str, binary: bool = False) -> Graph:
+    if binary:
+        from .binary import BINARY_GRAPH_FILE, load_binary_graph
+
+        return load_binary_graph(f"{src_dir}/{BINARY_GRAPH_FILE}")
+
+    with open(f"{src_dir}/nodes.json", "r") as f:
+        nodes_data = json.load(f)
+    with open(f"{src_dir}/nodes_features.json", "r") as f:
+        nodes_features = json.load(f)
+
+    with open(f"{src_dir}/streets.json", "r") as f:
+        streets_data: Dict[str, List[int]] = json.load(f)
+
+    with open(f"{src_dir}/edges.json", "r") as f:
+        edges_data: List[Tuple[int, int]] = json.load(f)
+
+    edges_features: Optional[List[Optional[Dict[str, Any]]]] = None
+    if os.path.exists(f"{src_dir}/edges_features.json"):
+        with open(f"{src_dir}/edges_features.json", "r") as f:
+            edges_features = json.load(f)
+
+    return build_graph(
+        [Coords(*coords) for coords in nodes_data],
+        nodes_features,
+        edges_data,
+        streets_data,
+        edges_features,
+    )
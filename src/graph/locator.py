@@ -0,0 +1,203 @@
+import json
+import math
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from .coords import Coords
+from .descriptions import DescriptionTable
+from .edge import Edge
+from .geometry import DEFAULT_CHUNK_SIZE, EdgeGeometry, as_points, nearest_points
+from .graph import Graph, load_graph
+from .node import Node
+from .spatial_index import EdgeIndex, PointIndex
+
+NODE = "node"
+EDGE = "edge"
+POI = "poi"
+
+
+class Location(NamedTuple):
+    kind: str  # NODE, EDGE or POI
+    index: int  # in graph.nodes, graph.edges or the PoIs of the model
+    distance: float
+    description: str
+
+
+class BatchLocation(NamedTuple):
+    # One entry per sample, indexes are -1 and distances inf if there is no
+    # feature of that kind
+    nodes: np.ndarray
+    nodes_distance: np.ndarray
+    edges: np.ndarray
+    edges_distance: np.ndarray
+    pois: np.ndarray
+    pois_distance: np.ndarray
+
+
+class Locator:
+    # Spatial indexes over the nodes, edges and PoIs of a model, answering
+    # "what is at these coords" queries. Descriptions of nodes and edges
+    # come from the graph description table, those of PoIs are built the
+    # first time a PoI is returned and then reused.
+    def __init__(
+        self,
+        graph: Graph,
+        pois: Sequence[Dict[str, Any]] = (),
+        cell_size: Optional[float] = None,
+    ) -> None:
+        self.graph = graph
+        self.edge_index = EdgeIndex(graph.edges, cell_size)
+
+        cell_size = self.edge_index.grid.cell_size
+        self.node_index = PointIndex(cell_size, [node.coords for node in graph.nodes])
+
+        # PoIs without coords could not be located and are left out
+        self.pois = list(pois)
+        self.pois_located = [i for i, poi in enumerate(self.pois) if "coords" in poi]
+        self.poi_index = PointIndex(
+            cell_size, [Coords(*self.pois[i]["coords"]) for i in self.pois_located]
+        )
+
+        self.descriptions: Dict[Tuple[str, int], str] = dict()
+
+        # Geometry arrays used by locate_batch
+        self.edge_geometry = EdgeGeometry(graph.edges)
+        self.edges_index = np.array([e.index for e in graph.edges], dtype=np.int64)
+        self.nodes_array = as_points(self.node_index.points)
+        self.pois_array = as_points(self.poi_index.points)
+        self.pois_index = np.array(self.pois_located, dtype=np.int64)
+
+    def describe(self, kind: str, index: int) -> str:
+        key = (kind, index)
+        if key not in self.descriptions:
+            if kind == NODE:
+                streets = self.graph.nodes[index].streets
+                self.descriptions[key] = (
+                    self.graph.descriptions.node_position(index, streets[0])
+                    if len(streets) > 0
+                    else ""
+                )
+            elif kind == EDGE:
+                self.descriptions[key] = self.graph.descriptions.edge_position(index)
+            else:
+                poi = self.pois[index]
+                self.descriptions[key] = " ".join(
+                    poi[k] for k in ("name", "location_description") if k in poi
+                )
+        return self.descriptions[key]
+
+    def node_location(self, node: Node, coords: Coords) -> Location:
+        return Location(
+            NODE, node.index, node.distance_to(coords), self.describe(NODE, node.index)
+        )
+
+    def edge_location(self, edge: Edge, coords: Coords) -> Location:
+        return Location(
+            EDGE, edge.index, edge.distance_to(coords), self.describe(EDGE, edge.index)
+        )
+
+    def poi_location(self, i: int, coords: Coords) -> Location:
+        index = self.pois_located[i]
+        return Location(
+            POI,
+            index,
+            self.poi_index.points[i].distance_to(coords),
+            self.describe(POI, index),
+        )
+
+    def nearest_node(self, coords: Coords) -> Optional[Location]:
+        if len(self.node_index) == 0:
+            return None
+        node = self.graph.nodes[self.node_index.nearest(coords)]
+        return self.node_location(node, coords)
+
+    def nearest_edge(self, coords: Coords) -> Optional[Location]:
+        if len(self.edge_index) == 0:
+            return None
+        return self.edge_location(self.edge_index.nearest(coords), coords)
+
+    def nearest_poi(self, coords: Coords) -> Optional[Location]:
+        if len(self.poi_index) == 0:
+            return None
+        return self.poi_location(self.poi_index.nearest(coords), coords)
+
+    def nearest(
+        self, coords: Coords, max_distance: float = math.inf
+    ) -> Optional[Location]:
+        # Closest feature of any kind, PoIs win ties over nodes and nodes
+        # over edges, as an edge is as close as its closest endpoint
+        best: Optional[Location] = None
+        for location in (
+            self.nearest_poi(coords),
+            self.nearest_node(coords),
+            self.nearest_edge(coords),
+        ):
+            if location is None:
+                continue
+            if best is None or location.distance < best.distance:
+                best = location
+
+        if best is None or best.distance > max_distance:
+            return None
+        return best
+
+    def within(
+        self, coords: Coords, radius: float, kinds: Sequence[str] = (POI, NODE, EDGE)
+    ) -> List[Location]:
+        # Features closer than radius, sorted by distance
+        locations: List[Location] = list()
+
+        if POI in kinds:
+            locations += [
+                self.poi_location(i, coords)
+                for i in self.poi_index.within(coords, radius)
+            ]
+        if NODE in kinds:
+            locations += [
+                self.node_location(self.graph.nodes[i], coords)
+                for i in self.node_index.within(coords, radius)
+            ]
+        if EDGE in kinds:
+            locations += [
+                self.edge_location(edge, coords)
+                for edge in self.edge_index.within(coords, radius)
+            ]
+
+        order = {kind: i for i, kind in enumerate((POI, NODE, EDGE))}
+        return sorted(locations, key=lambda l: (l.distance, order[l.kind], l.index))
+
+    def locate_batch(
+        self, points: np.ndarray, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> BatchLocation:
+        # Nearest node, edge and PoI of every row of an (N, 2) array, the
+        # vectorized equivalent of nearest_node, nearest_edge and nearest_poi
+        points = as_points(points)
+
+        nodes, nodes_distance = nearest_points(points, self.nodes_array, chunk_size)
+        edges, edges_distance = self.edge_geometry.nearest(
+            points, chunk_size=chunk_size
+        )
+        pois, pois_distance = nearest_points(points, self.pois_array, chunk_size)
+
+        # Positions in the arrays to indexes, found unless there are none
+        if len(self.edges_index) > 0:
+            edges = self.edges_index[edges]
+        if len(self.pois_index) > 0:
+            pois = self.pois_index[pois]
+
+        return BatchLocation(
+            nodes, nodes_distance, edges, edges_distance, pois, pois_distance
+        )
+
+
+def load_locator(out_dir: str) -> Locator:
+    # out_dir is the output directory of format.py
+    graph = load_graph(out_dir, binary=True)
+    with open(f"{out_dir}/model.json", "r") as f:
+        model_graph = json.load(f)["graph"]
+
+    # The graph builds its descriptions if model.json has none
+    if "descriptions" in model_graph:
+        graph.descriptions = DescriptionTable.from_json(
+            model_graph["descriptions"], list(model_graph["streets"])
+        )
+    return Locator(graph, model_graph["points_of_interest"])
@@ -1,7 +1,10 @@
 from utils import StrEnum
-from typing import Any, Dict, Optional, Union, List
+from typing import Any, Dict, FrozenSet, Optional, Union, List, Tuple, TYPE_CHECKING
 from .coords import Coords, Position
 
+if TYPE_CHECKING:
+    from .edge import Edge
+
 
 class Features(StrEnum):
     ON_BORDER = "on_border"
@@ -38,15 +41,38 @@ class Node(Position):
     def __init__(
         self, index: int, coords: Coords, features: Optional[Dict[str, Any]] = None
     ) -> None:
-        self.coords = coords
+        self._coords = coords
         self.index = index
-        self.adjacents_streets: List[str] = list()
+        self._id: Optional[str] = None
+        self.adjacents_streets: List[str] = list()  # one entry per incident edge
+        self.streets: Tuple[str, ...] = tuple()  # distinct and sorted
+        self.streets_set: FrozenSet[str] = frozenset()
+        self.edges: List["Edge"] = list()
 
         self.features = features if features is not None else default_features
 
+    @property
+    def coords(self) -> Coords:
+        return self._coords
+
+    @coords.setter
+    def coords(self, coords: Coords) -> None:
+        self._coords = coords
+        for edge in self.edges:
+            edge.update_geometry()
+
     @property
     def id(self) -> str:
-        return f"n{self.index}"
+        if self._id is None:
+            self._id = f"n{self.index}"
+        return self._id
+
+    def add_street(self, street: str) -> None:
+        self.adjacents_streets.append(street)
+
+        if street not in self.streets_set:
+            self.streets_set = self.streets_set | {street}
+            self.streets = tuple(sorted(self.streets_set))
 
     @property
     def on_border(self) -> bool:
@@ -63,29 +89,28 @@ class Node(Position):
         return IntersectionType.UNKNOWN
 
     def get_position_description(self, street: str) -> str:
-        description = f"on {street}"
         if self.on_border:
-            description += "near the border of the map"
+            position = "near the border of the map"
 
         elif self.is_dead_end():
-            description += "near the end of the street"
+            position = "near the end of the street"
 
         else:
-            streets = sorted(filter(lambda s: s != street, set(self.adjacents_streets)))
+            streets = [s for s in self.streets if s != street]
             if len(streets) == 0:
-                description += "in the middle of a block"
+                position = "in the middle of a block"
+            else:
+                position = (
+                    "near the intersection with "
+                    + ", ".join(streets[:-1])
+                    + (" and " if len(streets) > 1 else "")
+                    + streets[-1]
+                )
 
-            description += (
-                "near the intersection with "
-                + ", ".join(streets[:-1])
-                + (" and " if len(streets) > 1 else "")
-                + streets[-1]
-            )
-
-        return description
+        return f"on {street} {position}"
 
     def description(self, street: str) -> str:
-        streets = list(filter(lambda s: s != street, set(self.adjacents_streets)))
+        streets = [s for s in self.streets if s != street]
         if len(streets) == 0:
             if self.on_border:
                 return "the limit of the map"
@@ -114,7 +139,7 @@ class Node(Position):
         return self.coords
 
     def is_on_same_street(self, other: "Node") -> bool:
-        return bool(set(self.adjacents_streets) & set(other.adjacents_streets))
+        return not self.streets_set.isdisjoint(other.streets_set)
 
     def __getitem__(self, index: int) -> float:
         return self.coords[index]
@@ -126,6 +151,11 @@ class Node(Position):
         return str(self)
 
     def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
         if not isinstance(other, Node):
             return False
         return self.index == other.index
+
+    def __hash__(self) -> int:
+        return self.index
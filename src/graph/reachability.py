@@ -0,0 +1,200 @@
+import heapq
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .coords import Coords
+from .graph import Graph
+from .routing import PROFILES, Arc, build_arcs
+
+REACHABILITY_FILE = "reachability.npz"
+DEFAULT_RADII = (500.0, 1000.0)  # feets
+
+
+class DeltaLists:
+    # Sorted lists of ids stored one after the other as their differences,
+    # the first id of each list as is, list i being
+    # cumsum(deltas[offsets[i]:offsets[i + 1]])
+    def __init__(self, offsets: np.ndarray, deltas: np.ndarray) -> None:
+        self.offsets = offsets
+        self.deltas = deltas
+
+    @staticmethod
+    def from_lists(lists: Sequence[Sequence[int]]) -> "DeltaLists":
+        offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(ids) for ids in lists])
+
+        deltas = np.diff(
+            np.array([id for ids in lists for id in ids], dtype=np.int64),
+            prepend=0,
+        )
+        # Restart the differences at the first id of each list
+        starts = offsets[:-1][offsets[:-1] < offsets[1:]]
+        deltas[starts] = [ids[0] for ids in lists if len(ids) > 0]
+
+        small = len(deltas) == 0 or deltas.max() <= np.iinfo(np.uint16).max
+        return DeltaLists(offsets, deltas.astype(np.uint16 if small else np.uint32))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        deltas = self.deltas[self.offsets[i] : self.offsets[i + 1]]
+        return np.cumsum(deltas, dtype=np.int64)
+
+
+class ReachabilityTable:
+    # Edges and PoIs reachable from every node walking at most each of the
+    # radii, as lists of sorted ids: edges are indexes in graph.edges and
+    # PoIs in the PoIs of the model
+    def __init__(
+        self, radii: np.ndarray, edges: List[DeltaLists], pois: List[DeltaLists]
+    ) -> None:
+        self.radii = radii
+        self.edges = edges
+        self.pois = pois
+
+    def radius_index(self, radius: float) -> int:
+        for i, r in enumerate(self.radii):
+            if r == radius:
+                return i
+        raise ValueError(f"No reachability table for a radius of {radius} feets")
+
+    def reachable_edges(self, node: int, radius: float) -> np.ndarray:
+        return self.edges[self.radius_index(radius)][node]
+
+    def reachable_pois(
+        self, node: int, radius: float, mask: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        # mask is a boolean array with an entry per PoI, e.g. from
+        # category_mask, only the PoIs where it is True are kept
+        pois = self.pois[self.radius_index(radius)][node]
+        if mask is None:
+            return pois
+        return pois[mask[pois]]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {"radii": self.radii}
+        for i in range(len(self.radii)):
+            for kind, lists in (("edges", self.edges[i]), ("pois", self.pois[i])):
+                arrays[f"{i}/{kind}/offsets"] = lists.offsets
+                arrays[f"{i}/{kind}/deltas"] = lists.deltas
+        return arrays
+
+    @staticmethod
+    def from_arrays(arrays: Any) -> "ReachabilityTable":
+        radii = arrays["radii"]
+        edges: List[DeltaLists] = list()
+        pois: List[DeltaLists] = list()
+        for i in range(len(radii)):
+            for kind, lists in (("edges", edges), ("pois", pois)):
+                lists.append(
+                    DeltaLists(
+                        arrays[f"{i}/{kind}/offsets"], arrays[f"{i}/{kind}/deltas"]
+                    )
+                )
+        return ReachabilityTable(radii, edges, pois)
+
+
+def bounded_dijkstra(
+    arcs: List[List[Arc]], source: int, radius: float
+) -> Dict[int, float]:
+    # Costs from source of the nodes at most radius away
+    distances = {source: 0.0}
+    heap = [(0.0, source)]
+
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if distance > distances[node]:
+            continue
+        for head, cost, _ in arcs[node]:
+            d = distance + cost
+            if d <= radius and d < distances.get(head, math.inf):
+                distances[head] = d
+                heapq.heappush(heap, (d, head))
+
+    return distances
+
+
+def compute_reachability(
+    graph: Graph,
+    pois: Sequence[Dict[str, Any]],
+    radii: Sequence[float] = DEFAULT_RADII,
+    profile: str = "shortest",
+) -> ReachabilityTable:
+    # An edge is reachable once one of its nodes is, a PoI once the point
+    # of its edge closest to it is, walking along the edge from one of its
+    # nodes at the cost of the part walked
+    radii = sorted(radii)
+    max_radius = radii[-1] if radii else 0.0
+    arcs = build_arcs(graph, PROFILES[profile])
+
+    node_edges: List[List[int]] = [list() for _ in graph.nodes]
+    for i, edge in enumerate(graph.edges):
+        node_edges[edge.node1.index].append(i)
+        node_edges[edge.node2.index].append(i)
+
+    # PoIs of every edge with their distance from node1, those without
+    # coords could not be located and are left out
+    edge_pois: List[List[Tuple[int, float]]] = [list() for _ in graph.edges]
+    for i, poi in enumerate(pois):
+        if "edge" not in poi or "coords" not in poi:
+            continue
+        edge = graph.edges[poi["edge"]]
+        point = edge.closest_point(Coords(*poi["coords"]))
+        edge_pois[poi["edge"]].append((i, edge.node1.distance_to(point)))
+
+    edges_lists: List[List[List[int]]] = [list() for _ in radii]
+    pois_lists: List[List[List[int]]] = [list() for _ in radii]
+
+    for node in range(len(graph.nodes)):
+        distances = bounded_dijkstra(arcs, node, max_radius)
+
+        edges: Dict[int, float] = dict()
+        reached_pois: Dict[int, float] = dict()
+        for tail, distance in distances.items():
+            for edge in node_edges[tail]:
+                edges[edge] = min(edges.get(edge, math.inf), distance)
+
+            for _, cost, edge in arcs[tail]:
+                length = graph.edges[edge].length
+                from_node1 = graph.edges[edge].node1.index == tail
+                for poi, offset in edge_pois[edge]:
+                    walked = offset if from_node1 else length - offset
+                    d = distance + (cost * walked / length if length > 0 else 0.0)
+                    reached_pois[poi] = min(reached_pois.get(poi, math.inf), d)
+
+        for i, radius in enumerate(radii):
+            edges_lists[i].append(sorted(e for e, d in edges.items() if d <= radius))
+            pois_lists[i].append(
+                sorted(p for p, d in reached_pois.items() if d <= radius)
+            )
+
+    return ReachabilityTable(
+        np.array(radii, dtype=np.float64),
+        [DeltaLists.from_lists(lists) for lists in edges_lists],
+        [DeltaLists.from_lists(lists) for lists in pois_lists],
+    )
+
+
+def category_mask(pois: Sequence[Dict[str, Any]], category: str) -> np.ndarray:
+    # True for the PoIs in category or one of its subcategories
+    return np.array(
+        [
+            any(
+                c == category or c.startswith(f"{category}.")
+                for c in poi.get("categories", ())
+            )
+            for poi in pois
+        ],
+        dtype=np.bool_,
+    )
+
+
+def save_reachability(path: str, table: ReachabilityTable) -> None:
+    with open(path, "wb") as f:
+        np.savez(f, **table.to_arrays())
+
+
+def load_reachability(path: str) -> ReachabilityTable:
+    with np.load(path) as data:
+        return ReachabilityTable.from_arrays({key: data[key] for key in data.files})
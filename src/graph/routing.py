@@ -0,0 +1,434 @@
+import heapq
+import math
+import os
+import shutil
+from typing import (
+    Any,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+import numpy as np
+from .distance_table import (
+    DISTANCE_TABLES_DIR,
+    DistanceTable,
+    load_distance_table,
+    next_hop_dtype,
+    save_distance_table,
+)
+from .edge import Edge
+from .graph import Graph, load_graph
+from .node import Node
+
+ROUTING_FILE = "routing.npz"
+LANDMARKS_COUNT = 16
+UNREACHABLE = 1e300  # stands for inf in the landmark bounds
+
+DIRECTIONS = ("two_way", "one_way_forward", "one_way_backward")
+SLOPES = ("flat", "uphill", "downhill")
+OPPOSITE_SLOPE = {"uphill": "downhill", "downhill": "uphill"}
+
+Arc = Tuple[int, float, int]  # head node, cost, edge position in graph.edges
+
+
+def canonical(value: Any, choices: Sequence[str]) -> Any:
+    # Feature values are hand labeled and sometimes truncated, e.g.
+    # "one_way_forwar" or "downhil"
+    if not isinstance(value, str) or value in choices or len(value) < 3:
+        return value
+    for choice in choices:
+        if choice.startswith(value):
+            return choice
+    return value
+
+
+class CostProfile:
+    # Cost of walking along edges and through nodes, in feets. Multipliers
+    # scale the length of the edges with a feature, math.inf makes them
+    # impassable; penalties are added when going through an intersection
+    # missing a feature. Subclasses can override edge_cost and node_cost.
+    def __init__(
+        self,
+        stairs: float = 1.0,
+        roadwork: float = 1.0,
+        slope: Optional[Dict[str, float]] = None,
+        surface: Optional[Dict[str, float]] = None,
+        no_crosswalk: float = 0.0,
+        no_walk_light: float = 0.0,
+        no_tactile_paving: float = 0.0,
+        one_way: bool = True,
+    ) -> None:
+        self.stairs = stairs
+        self.roadwork = roadwork
+        self.slope = slope if slope is not None else dict()
+        self.surface = surface if surface is not None else dict()
+        self.no_crosswalk = no_crosswalk
+        self.no_walk_light = no_walk_light
+        self.no_tactile_paving = no_tactile_paving
+        self.one_way = one_way
+
+    def edge_cost(self, edge: Edge, forward: bool) -> float:
+        # forward is True when walking from node1 to node2
+        features = edge.features
+
+        if self.one_way:
+            direction = canonical(features.get("traffic_direction"), DIRECTIONS)
+            if direction == ("one_way_backward" if forward else "one_way_forward"):
+                return math.inf
+
+        multiplier = 1.0
+        if features.get("stairs"):
+            multiplier *= self.stairs
+        if features.get("roadwork"):
+            multiplier *= self.roadwork
+
+        slope = canonical(features.get("slope"), SLOPES)
+        if not forward:
+            slope = OPPOSITE_SLOPE.get(slope, slope)
+        multiplier *= self.slope.get(slope, 1.0)
+        multiplier *= self.surface.get(features.get("surface"), 1.0)
+
+        if multiplier == math.inf:
+            return math.inf
+        return edge.length * multiplier
+
+    def node_cost(self, node: Node) -> float:
+        if len(node.streets) < 2:
+            return 0.0
+
+        features = node.features
+        cost = 0.0
+        if not features.get("crosswalk"):
+            cost += self.no_crosswalk
+        if not features.get("walk_light"):
+            cost += self.no_walk_light
+        if not features.get("tactile_paving"):
+            cost += self.no_tactile_paving
+        return cost
+
+
+PROFILES = {
+    "shortest": CostProfile(),
+    "avoid_stairs": CostProfile(stairs=math.inf),
+    "prefer_walk_lights": CostProfile(no_crosswalk=300.0, no_walk_light=300.0),
+    "accessible": CostProfile(
+        stairs=math.inf,
+        roadwork=3.0,
+        slope={"uphill": 1.5, "downhill": 1.2},
+        surface={"cobblestone": 1.5},
+        no_crosswalk=300.0,
+        no_walk_light=150.0,
+        no_tactile_paving=100.0,
+    ),
+}
+
+
+def build_arcs(graph: Graph, profile: CostProfile) -> List[List[Arc]]:
+    # Outgoing arcs of every node, entering a node costs its node_cost
+    node_costs = [profile.node_cost(node) for node in graph.nodes]
+    arcs: List[List[Arc]] = [list() for _ in graph.nodes]
+
+    for i, edge in enumerate(graph.edges):
+        node1, node2 = edge.node1.index, edge.node2.index
+
+        cost = profile.edge_cost(edge, True) + node_costs[node2]
+        if cost < math.inf:
+            arcs[node1].append((node2, cost, i))
+
+        cost = profile.edge_cost(edge, False) + node_costs[node1]
+        if cost < math.inf:
+            arcs[node2].append((node1, cost, i))
+
+    return arcs
+
+
+def reverse_arcs(arcs: List[List[Arc]]) -> List[List[Arc]]:
+    reversed_arcs: List[List[Arc]] = [list() for _ in arcs]
+    for tail, node_arcs in enumerate(arcs):
+        for head, cost, edge in node_arcs:
+            reversed_arcs[head].append((tail, cost, edge))
+    return reversed_arcs
+
+
+def dijkstra(arcs: List[List[Arc]], source: int) -> np.ndarray:
+    distances = [math.inf] * len(arcs)
+    distances[source] = 0.0
+    heap = [(0.0, source)]
+
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if distance > distances[node]:
+            continue
+        for head, cost, _ in arcs[node]:
+            d = distance + cost
+            if d < distances[head]:
+                distances[head] = d
+                heapq.heappush(heap, (d, head))
+
+    return np.array(distances, dtype=np.float64)
+
+
+def shortest_path_tree(
+    arcs: List[List[Arc]], source: int
+) -> Tuple[List[float], List[int]]:
+    # Costs from source and the node each node is reached from, -1 for
+    # source and the nodes that can not be reached
+    distances = [math.inf] * len(arcs)
+    distances[source] = 0.0
+    parents = [-1] * len(arcs)
+    heap = [(0.0, source)]
+
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if distance > distances[node]:
+            continue
+        for head, cost, _ in arcs[node]:
+            d = distance + cost
+            if d < distances[head]:
+                distances[head] = d
+                parents[head] = node
+                heapq.heappush(heap, (d, head))
+
+    return distances, parents
+
+
+class Landmarks(NamedTuple):
+    nodes: np.ndarray  # (k,) landmark nodes
+    distances_from: np.ndarray  # (k, n) cost from each landmark to each node
+    distances_to: np.ndarray  # (k, n) cost from each node to each landmark
+
+
+def compute_landmarks(
+    arcs: List[List[Arc]], count: int = LANDMARKS_COUNT
+) -> Landmarks:
+    # Farthest landmark selection: each landmark is the node farthest from
+    # the ones already chosen, walking in either direction
+    reversed_arcs = reverse_arcs(arcs)
+    n = len(arcs)
+
+    nodes: List[int] = list()
+    distances_from: List[np.ndarray] = list()
+    distances_to: List[np.ndarray] = list()
+
+    closest = np.full(n, np.inf)
+    candidate = 0
+    while len(nodes) < min(count, n):
+        nodes.append(candidate)
+        distances_from.append(dijkstra(arcs, candidate))
+        distances_to.append(dijkstra(reversed_arcs, candidate))
+
+        # Unreachable nodes count as far, so disconnected parts get one
+        nearest = np.minimum(distances_from[-1], distances_to[-1])
+        closest = np.minimum(closest, np.minimum(nearest, UNREACHABLE))
+        closest[nodes] = -1.0
+        candidate = int(np.argmax(closest))
+        if closest[candidate] < 0:
+            break
+
+    return Landmarks(
+        np.array(nodes, dtype=np.int32),
+        np.array(distances_from, dtype=np.float64).reshape(-1, n),
+        np.array(distances_to, dtype=np.float64).reshape(-1, n),
+    )
+
+
+def save_landmarks(path: str, landmarks: Dict[str, Landmarks]) -> None:
+    arrays: Dict[str, np.ndarray] = dict()
+    for name, table in landmarks.items():
+        for field, array in table._asdict().items():
+            arrays[f"{name}/{field}"] = array
+
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def load_landmarks(path: str) -> Dict[str, Landmarks]:
+    with np.load(path) as data:
+        names = sorted({key.split("/")[0] for key in data.files})
+        return {
+            name: Landmarks(
+                *(data[f"{name}/{field}"] for field in Landmarks._fields)
+            )
+            for name in names
+        }
+
+
+def compute_distance_table(arcs: List[List[Arc]]) -> DistanceTable:
+    # One search per target over the reversed arcs, the node a node is
+    # reached from is its next hop towards the target
+    reversed_arcs = reverse_arcs(arcs)
+    n = len(arcs)
+
+    distances = np.empty((n, n), dtype=np.float32)
+    next_hops = np.empty((n, n), dtype=next_hop_dtype(n))
+    for target in range(n):
+        distances[target], next_hops[target] = shortest_path_tree(
+            reversed_arcs, target
+        )
+
+    # Rows are targets, sources are expected
+    return DistanceTable(
+        np.ascontiguousarray(distances.T), np.ascontiguousarray(next_hops.T)
+    )
+
+
+def save_distance_tables(path: str, graph: Graph, profiles: Sequence[str]) -> List[str]:
+    # Replaces the tables in the directory path with those of profiles, the
+    # names of PROFILES, and returns the files written
+    if os.path.exists(path):
+        shutil.rmtree(path)
+
+    files: List[str] = list()
+    for name in profiles:
+        table = compute_distance_table(build_arcs(graph, PROFILES[name]))
+        files += save_distance_table(path, name, table)
+    return files
+
+
+class Route(NamedTuple):
+    nodes: List[Node]
+    edges: List[Edge]
+    cost: float
+    length: float
+
+
+class Router:
+    # A* with landmark (ALT) lower bounds: for every landmark L the
+    # triangle inequality gives d(v, t) >= d(L, t) - d(L, v) and
+    # d(v, t) >= d(v, L) - d(t, L), and their maximum is the heuristic.
+    def __init__(
+        self,
+        graph: Graph,
+        profile: Union[str, CostProfile] = "shortest",
+        landmarks: Optional[Landmarks] = None,
+        table: Optional[DistanceTable] = None,
+    ) -> None:
+        # Routes are looked up in table when there is one
+        if isinstance(profile, str):
+            profile = PROFILES[profile]
+
+        self.graph = graph
+        self.profile = profile
+        self.table = table
+        self.arcs = build_arcs(graph, profile)
+        self.landmarks = (
+            landmarks if landmarks is not None else compute_landmarks(self.arcs)
+        )
+
+        # Bounds are the sums of a term of the target and one of the node:
+        # d(L, t) + -d(L, v) and -d(t, L) + d(v, L), inf becomes UNREACHABLE
+        # so that no sum is nan
+        terms = np.concatenate(
+            (-self.landmarks.distances_from, self.landmarks.distances_to)
+        )
+        self.terms = np.clip(terms, -UNREACHABLE, UNREACHABLE)
+
+    def heuristic(self, target: int) -> List[float]:
+        # Lower bounds of the cost from every node to target, UNREACHABLE or
+        # more if target can not be reached from the node. Those of all the
+        # nodes at once are cheaper than one node at a time in the search.
+        bounds = np.max(self.terms - self.terms[:, target : target + 1], axis=0)
+        return np.maximum(bounds, 0.0).tolist()
+
+    def route(
+        self, source: Union[Node, int], target: Union[Node, int]
+    ) -> Optional[Route]:
+        s = source.index if isinstance(source, Node) else source
+        t = target.index if isinstance(target, Node) else target
+
+        if self.table is not None:
+            return self.table_route(s, t)
+
+        bounds = self.heuristic(t)
+        if bounds[s] >= UNREACHABLE / 2:
+            return None
+
+        costs = [math.inf] * len(bounds)
+        costs[s] = 0.0
+        previous: List[Tuple[int, int]] = [(-1, -1)] * len(bounds)  # (node, edge)
+
+        # The heuristic is consistent, the first time a node is popped is
+        # with its lowest cost and later entries are stale. Ties are broken
+        # in favour of the highest cost so far, the node closer to the target
+        heap = [(bounds[s], 0.0, s)]
+        while heap:
+            _, negative_cost, node = heapq.heappop(heap)
+            cost = -negative_cost
+            if cost > costs[node]:
+                continue
+            if node == t:
+                break
+
+            for head, arc_cost, edge in self.arcs[node]:
+                c = cost + arc_cost
+                if c < costs[head]:
+                    h = bounds[head]
+                    if h >= UNREACHABLE / 2:
+                        continue
+                    costs[head] = c
+                    previous[head] = (node, edge)
+                    heapq.heappush(heap, (c + h, -c, head))
+        else:
+            return None
+
+        nodes = [t]
+        edges: List[int] = list()
+        while nodes[-1] != s:
+            node, edge = previous[nodes[-1]]
+            nodes.append(node)
+            edges.append(edge)
+        nodes.reverse()
+        edges.reverse()
+
+        return self.make_route(nodes, edges, costs[t])
+
+    def table_route(self, source: int, target: int) -> Optional[Route]:
+        nodes = self.table.path(source, target) if self.table is not None else None
+        if nodes is None:
+            return None
+
+        # Cheapest arc to each next hop, there may be several edges
+        edges: List[int] = list()
+        cost = 0.0
+        for node, next_node in zip(nodes, nodes[1:]):
+            arc_cost, edge = min(
+                (c, e) for head, c, e in self.arcs[node] if head == next_node
+            )
+            edges.append(edge)
+            cost += arc_cost
+
+        return self.make_route(nodes, edges, cost)
+
+    def make_route(self, nodes: List[int], edges: List[int], cost: float) -> Route:
+        return Route(
+            [self.graph.nodes[i] for i in nodes],
+            [self.graph.edges[i] for i in edges],
+            cost,
+            sum(self.graph.edges[i].length for i in edges),
+        )
+
+    def distance(self, source: Union[Node, int], target: Union[Node, int]) -> float:
+        # Cost of the cheapest route, inf if there is none
+        if self.table is not None:
+            s = source.index if isinstance(source, Node) else source
+            t = target.index if isinstance(target, Node) else target
+            return self.table.distance(s, t)
+
+        route = self.route(source, target)
+        return route.cost if route is not None else math.inf
+
+
+def load_router(out_dir: str, profile: str = "shortest") -> Router:
+    # out_dir is the output directory of format.py, profile one of PROFILES.
+    # Routes are searched unless format.py built the table of the profile.
+    graph = load_graph(out_dir, binary=True)
+    return Router(
+        graph,
+        profile,
+        load_landmarks(f"{out_dir}/{ROUTING_FILE}")[profile],
+        load_distance_table(f"{out_dir}/{DISTANCE_TABLES_DIR}", profile),
+    )
@@ -0,0 +1,264 @@
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import math
+from .coords import Coords
+from .edge import Edge
+
+Cell = Tuple[int, int]
+
+
+class UniformGrid:
+    def __init__(self, cell_size: float) -> None:
+        if cell_size <= 0:
+            raise ValueError("Cell size must be positive")
+
+        self.cell_size = cell_size
+        self.cells: Dict[Cell, List[int]] = dict()
+
+        self.min_cell: Optional[Cell] = None
+        self.max_cell: Optional[Cell] = None
+
+    def cell_of(self, coords: Coords) -> Cell:
+        return (
+            math.floor(coords[0] / self.cell_size),
+            math.floor(coords[1] / self.cell_size),
+        )
+
+    def insert(self, item: int, bottom_left: Coords, top_right: Coords) -> None:
+        min_x, min_y = self.cell_of(bottom_left)
+        max_x, max_y = self.cell_of(top_right)
+
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                self.cells.setdefault((x, y), list()).append(item)
+
+        if self.min_cell is None or self.max_cell is None:
+            self.min_cell = (min_x, min_y)
+            self.max_cell = (max_x, max_y)
+        else:
+            self.min_cell = (min(self.min_cell[0], min_x), min(self.min_cell[1], min_y))
+            self.max_cell = (max(self.max_cell[0], max_x), max(self.max_cell[1], max_y))
+
+    def ring(self, center: Cell, radius: int) -> Iterator[int]:
+        cx, cy = center
+        if radius == 0:
+            yield from self.cells.get(center, ())
+            return
+
+        for x in range(cx - radius, cx + radius + 1):
+            yield from self.cells.get((x, cy - radius), ())
+            yield from self.cells.get((x, cy + radius), ())
+        for y in range(cy - radius + 1, cy + radius):
+            yield from self.cells.get((cx - radius, y), ())
+            yield from self.cells.get((cx + radius, y), ())
+
+    def max_radius(self, center: Cell) -> int:
+        if self.min_cell is None or self.max_cell is None:
+            return -1
+
+        return max(
+            center[0] - self.min_cell[0],
+            self.max_cell[0] - center[0],
+            center[1] - self.min_cell[1],
+            self.max_cell[1] - center[1],
+            0,
+        )
+
+    def explored_distance(self, coords: Coords, center: Cell, radius: int) -> float:
+        # Lower bound on the distance between coords and anything stored
+        # outside the cells within `radius` rings from `center`.
+        cx, cy = center
+        return min(
+            coords[0] - (cx - radius) * self.cell_size,
+            (cx + radius + 1) * self.cell_size - coords[0],
+            coords[1] - (cy - radius) * self.cell_size,
+            (cy + radius + 1) * self.cell_size - coords[1],
+        )
+
+
+class PointIndex:
+    def __init__(self, cell_size: float, points: Sequence[Coords] = ()) -> None:
+        self.grid = UniformGrid(cell_size)
+        self.points: List[Coords] = list()
+
+        for point in points:
+            self.insert(point)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def insert(self, coords: Coords) -> int:
+        index = len(self.points)
+        self.points.append(coords)
+        self.grid.insert(index, coords, coords)
+        return index
+
+    def neighbours(self, coords: Coords, radius: float) -> Iterator[int]:
+        # Candidates for within(), not filtered by distance
+        cx, cy = self.grid.cell_of(coords)
+        r = math.ceil(radius / self.grid.cell_size)
+
+        for x in range(cx - r, cx + r + 1):
+            for y in range(cy - r, cy + r + 1):
+                yield from self.grid.cells.get((x, y), ())
+
+    def within(self, coords: Coords, radius: float) -> List[int]:
+        return sorted(
+            i
+            for i in self.neighbours(coords, radius)
+            if self.points[i].distance_to(coords) < radius
+        )
+
+    def any_within(self, coords: Coords, radius: float) -> bool:
+        return any(
+            self.points[i].distance_to(coords) < radius
+            for i in self.neighbours(coords, radius)
+        )
+
+    def nearest(self, coords: Coords) -> int:
+        center = self.grid.cell_of(coords)
+
+        best: Optional[Tuple[float, int]] = None
+        for r in range(self.grid.max_radius(center) + 1):
+            for i in self.grid.ring(center, r):
+                distance = self.points[i].distance_to(coords)
+                if best is None or (distance, i) < best:
+                    best = (distance, i)
+
+            if (
+                best is not None
+                and self.grid.explored_distance(coords, center, r) > best[0]
+            ):
+                break
+
+        if best is None:
+            raise ValueError("No point found")
+        return best[1]
+
+    def close_pairs(self, radius: float) -> List[Tuple[int, int]]:
+        pairs: List[Tuple[int, int]] = list()
+
+        for i, point in enumerate(self.points):
+            pairs.extend((i, j) for j in self.within(point, radius) if j > i)
+
+        return pairs
+
+
+class EdgeIndex:
+    def __init__(self, edges: List[Edge], cell_size: Optional[float] = None) -> None:
+        self.edges = edges
+
+        if cell_size is None:
+            lengths = [edge.length for edge in edges if edge.length > 0]
+            cell_size = sum(lengths) / len(lengths) if len(lengths) > 0 else 1.0
+
+        self.grid = UniformGrid(cell_size)
+        for i, edge in enumerate(edges):
+            self.grid.insert(
+                i,
+                Coords(min(edge[0][0], edge[1][0]), min(edge[0][1], edge[1][1])),
+                Coords(max(edge[0][0], edge[1][0]), max(edge[0][1], edge[1][1])),
+            )
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    def nearest(self, coords: Coords, street: Optional[str] = None) -> Edge:
+        return self._search(
+            coords,
+            street,
+            lambda edge: edge.distance_to(coords),
+        )
+
+    def nearest_containing(self, coords: Coords, street: Optional[str] = None) -> Edge:
+        return self._search(
+            coords,
+            street,
+            lambda edge: (
+                coords.distance_to_line(edge)
+                if edge.contains(coords.project_on(edge))
+                else None
+            ),
+        )
+
+    def within(self, coords: Coords, radius: float) -> List[Edge]:
+        cx, cy = self.grid.cell_of(coords)
+        r = math.ceil(radius / self.grid.cell_size)
+
+        found: Dict[int, float] = dict()
+        for x in range(cx - r, cx + r + 1):
+            for y in range(cy - r, cy + r + 1):
+                for i in self.grid.cells.get((x, y), ()):
+                    if i not in found:
+                        found[i] = self.edges[i].distance_to(coords)
+
+        return [
+            self.edges[i]
+            for i in sorted(found, key=lambda i: (found[i], i))
+            if found[i] < radius
+        ]
+
+    def containing(
+        self,
+        coords: Coords,
+        max_distance: float,
+        street: Optional[str] = None,
+    ) -> List[Edge]:
+        center = self.grid.cell_of(coords)
+        radius = math.ceil(max_distance / self.grid.cell_size)
+
+        found: Dict[int, float] = dict()
+        seen = set()
+
+        for r in range(min(radius, self.grid.max_radius(center)) + 1):
+            for i in self.grid.ring(center, r):
+                if i in seen:
+                    continue
+                seen.add(i)
+
+                edge = self.edges[i]
+                if street is not None and edge.street != street:
+                    continue
+                if not edge.contains(coords.project_on(edge)):
+                    continue
+
+                distance = coords.distance_to_line(edge)
+                if distance <= max_distance:
+                    found[i] = distance
+
+        return [self.edges[i] for i in sorted(found, key=lambda i: (found[i], i))]
+
+    def _search(
+        self,
+        coords: Coords,
+        street: Optional[str],
+        distance_fn: Callable[[Edge], Optional[float]],
+    ) -> Edge:
+        center = self.grid.cell_of(coords)
+        max_radius = self.grid.max_radius(center)
+
+        best: Optional[Tuple[float, int]] = None
+        seen = set()
+
+        for r in range(max_radius + 1):
+            for i in self.grid.ring(center, r):
+                if i in seen:
+                    continue
+                seen.add(i)
+
+                edge = self.edges[i]
+                if street is not None and edge.street != street:
+                    continue
+
+                distance = distance_fn(edge)
+                if distance is not None and (best is None or (distance, i) < best):
+                    best = (distance, i)
+
+            if (
+                best is not None
+                and self.grid.explored_distance(coords, center, r) > best[0]
+            ):
+                break
+
+        if best is None:
+            raise ValueError("No edge found")
+        return self.edges[best[1]]
@@ -0,0 +1,173 @@
+import gc
+import json
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+
+from graph import Coords, GraphEncoder
+
+# Rows of nodes and edges are converted CHUNK_SIZE at a time
+CHUNK_SIZE = 32
+BUFFER_SIZE = 256
+
+
+def coords_to_array(
+    coords: Sequence[Any], precision: Optional[int] = None
+) -> np.ndarray:
+    array = np.array([(c[0], c[1]) for c in coords], dtype=np.float64)
+    array = array.reshape(-1, 2)
+
+    if precision is not None:
+        array = np.round(array, precision)
+    return array
+
+
+def coords_to_lists(
+    coords: Sequence[Any], precision: Optional[int] = None
+) -> List[List[float]]:
+    return coords_to_array(coords, precision).tolist()
+
+
+def plain_section(name: str, value: Any, precision: Optional[int] = None) -> Any:
+    if name == "nodes":
+        return coords_to_array(value, precision)
+
+    if name == "edges":
+        return np.array(value, dtype=np.int64).reshape(-1, 2)
+
+    if name == "latlng_reference" and "coords" in value:
+        return {**value, "coords": coords_to_lists([value["coords"]], precision)[0]}
+
+    return value
+
+
+class ModelEncoder(GraphEncoder):
+    # Coords (those of the PoIs) are rounded as coords_to_array does
+    def __init__(self, precision: Optional[int] = None, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.precision = precision
+
+    def default(self, o: Any) -> Any:
+        if isinstance(o, Coords):
+            return coords_to_lists([o], self.precision)[0]
+        return super().default(o)
+
+
+class ModelWriter:
+    # Writes a model section by section: the top level dict and
+    # model["graph"] are streamed key by key, and each section is written
+    # as it is encoded, node and edge rows being converted a chunk at a
+    # time. With indent=4 the output matches json.dump(model, f, indent=4).
+    def __init__(
+        self,
+        f: IO[str],
+        compact: bool = False,
+        precision: Optional[int] = None,
+    ) -> None:
+        self.f = f
+        self.precision = precision
+        self.indent: Optional[int] = None if compact else 4
+        self.separators = (",", ":") if compact else (",", ": ")
+        self.encoder = ModelEncoder(
+            precision, indent=self.indent, separators=self.separators
+        )
+
+    def newline(self, level: int) -> str:
+        if self.indent is None:
+            return ""
+        return "\n" + " " * (self.indent * level)
+
+    def encode(self, value: Any, level: int) -> None:
+        # Written as it is encoded, BUFFER_SIZE characters at a time, so
+        # that no encoded section is held in memory
+        newline = self.newline(level)
+        pieces: List[str] = list()
+        size = 0
+        for piece in self.encoder.iterencode(value):
+            pieces.append(piece)
+            size += len(piece)
+            if size >= BUFFER_SIZE:
+                self.write_indented(pieces, newline)
+                pieces.clear()
+                size = 0
+        self.write_indented(pieces, newline)
+        # The functions of a pure Python encoding reference each other, free
+        # them now rather than letting one set per section pile up
+        gc.collect(1)
+
+    def write_indented(self, pieces: List[str], newline: str) -> None:
+        text = "".join(pieces)
+        if self.indent is not None:
+            text = text.replace("\n", newline)
+        self.f.write(text)
+
+    def write_rows(self, name: str, value: Sequence[Any], level: int) -> None:
+        # Rows of numbers are formatted directly, repr matches the encoder
+        if len(value) == 0:
+            self.f.write("[]")
+            return
+
+        separator = self.separators[0] + self.newline(level + 1)
+        row_newline = self.newline(level + 2)
+        row = (
+            "["
+            + row_newline
+            + (self.separators[0] + row_newline).join(["{!r}", "{!r}"])
+            + self.newline(level + 1)
+            + "]"
+        )
+
+        self.f.write("[" + self.newline(level + 1))
+        for start in range(0, len(value), CHUNK_SIZE):
+            rows = plain_section(
+                name, value[start : start + CHUNK_SIZE], self.precision
+            )
+            if start > 0:
+                self.f.write(separator)
+            self.f.write(separator.join([row.format(*r) for r in rows.tolist()]))
+        self.f.write(self.newline(level) + "]")
+
+    def write_value(self, name: str, value: Any, level: int) -> None:
+        if name in ("nodes", "edges"):
+            self.write_rows(name, value, level)
+        else:
+            self.encode(plain_section(name, value, self.precision), level)
+
+    def write_object(self, items: Iterator[Tuple[str, Any]], level: int) -> None:
+        self.f.write("{")
+
+        empty = True
+        for key, value in items:
+            if not empty:
+                self.f.write(self.separators[0])
+            self.f.write(self.newline(level + 1))
+            self.f.write(json.dumps(key) + self.separators[1])
+
+            if isinstance(value, Iterator):
+                self.write_object(value, level + 1)
+            else:
+                self.write_value(key, value, level + 1)
+            empty = False
+
+        if not empty:
+            self.f.write(self.newline(level))
+        self.f.write("}")
+
+    def model_items(self, model: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+        for key, value in model.items():
+            if key == "graph":
+                yield key, iter(value.items())
+            else:
+                yield key, value
+
+    def write(self, model: Dict[str, Any]) -> None:
+        self.write_object(self.model_items(model), 0)
+
+
+def write_model(
+    model: Dict[str, Any],
+    path: str,
+    compact: bool = False,
+    precision: Optional[int] = None,
+) -> None:
+    with open(path, "w") as f:
+        ModelWriter(f, compact, precision).write(model)
@@ -0,0 +1,238 @@
+import re
+from datetime import time as Time
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+OPENING_HOURS_CACHE_SIZE = 4096
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+BUCKET_MINUTES = 60
+
+WEEKDAYS = ["Mo", "Tu", "We", "Th", "Fr", "Sa", "Su"]
+
+# Matches the time ranges listed in the description, with their days
+DESCRIPTION_PATTERN = re.compile(
+    r"(\w+(?:-\w+)?(?:,\w+(?:-\w+)?)*)?\s*(\d{2}:\d{2})-(\d{2}:\d{2})"
+)
+# Tokens of the rules used to build the weekly intervals
+DAYS = "|".join(WEEKDAYS)
+TOKEN_PATTERN = re.compile(
+    r"\s*(?:"
+    r"(?P<start>\d{1,2}):(?P<start_m>\d{2})\s*-\s*"
+    r"(?P<end>\d{1,2}):(?P<end_m>\d{2})"
+    rf"|(?P<day>{DAYS})(?:\s*-\s*(?P<last_day>{DAYS}))?\b"
+    r"|(?P<off>off|closed)\b"
+    r"|(?P<separator>[;,])"
+    r"|(?P<other>[^\s;,]+)"
+    r")"
+)
+
+Interval = Tuple[int, int]  # minutes from Monday 00:00, end excluded
+
+
+class OpeningHours(NamedTuple):
+    description: Optional[str]  # None if the hours could not be formatted
+    intervals: Optional[Tuple[Interval, ...]]  # None if not supported
+
+
+def to_am_pm(hours: int, minutes: int) -> str:
+    # Same as strftime("%I:%M %p").lstrip("0")
+    return f"{hours % 12 or 12}:{minutes:02d} {'AM' if hours < 12 else 'PM'}"
+
+
+def parse_time(t: str) -> Optional[Tuple[int, int]]:
+    # t is "dd:dd", accepted as strptime(t, "%H:%M") would do
+    hours, minutes = t[:2], t[3:]
+    if not (hours[0] in "01" or (hours[0] == "2" and hours[1] in "0123")):
+        return None
+    if minutes[0] not in "012345":
+        return None
+    return int(hours), int(minutes)
+
+
+def parse_description(opening_hours: str) -> Optional[str]:
+    matches = DESCRIPTION_PATTERN.findall(opening_hours)
+    if not matches:
+        return None
+
+    result = []
+    for days, start, end in matches:
+        times = list()
+        for t in (start, end):
+            parsed = parse_time(t)
+            if parsed is None:
+                return None
+            times.append(to_am_pm(*parsed))
+
+        days = days.strip()
+        if days:
+            result.append(f"{days} {times[0]} - {times[1]}")
+        else:
+            result.append(f"{times[0]} - {times[1]}")
+
+    return "; ".join(result)
+
+
+def merge_intervals(intervals: List[Interval]) -> Tuple[Interval, ...]:
+    # Wraps the intervals past the end of the week, then merges them
+    wrapped: List[Interval] = list()
+    for start, end in intervals:
+        if end > MINUTES_PER_WEEK:
+            wrapped.append((start, MINUTES_PER_WEEK))
+            wrapped.append((0, end - MINUTES_PER_WEEK))
+        else:
+            wrapped.append((start, end))
+
+    merged: List[Interval] = list()
+    for start, end in sorted(wrapped):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return tuple(merged)
+
+
+def parse_intervals(opening_hours: str) -> Optional[Tuple[Interval, ...]]:
+    # Rules separated by ";" replace the hours of the previous ones for
+    # their days, rules separated by "," add to them. A rule without days
+    # applies to the whole week, rules with unsupported selectors (public
+    # holidays, months, ...) are skipped. None if no rule is supported.
+    if "24/7" in opening_hours:
+        return ((0, MINUTES_PER_WEEK),)
+
+    week: List[List[Interval]] = [list() for _ in WEEKDAYS]
+
+    days: List[int] = list()
+    times: List[Interval] = list()
+    closed = False
+    supported = True
+    additional = False
+    applied = False
+
+    def apply() -> None:
+        nonlocal applied
+        if not supported or (not times and not closed):
+            return
+        applied = True
+
+        for day in days or range(len(WEEKDAYS)):
+            if closed or not additional:
+                week[day] = list()
+            if not closed:
+                offset = day * MINUTES_PER_DAY
+                week[day] += [(offset + s, offset + e) for s, e in times]
+
+    for match in TOKEN_PATTERN.finditer(opening_hours):
+        if match.group("day"):
+            if times or closed:
+                apply()
+                days, times, closed, supported = list(), list(), False, True
+                additional = True
+
+            first = WEEKDAYS.index(match.group("day"))
+            last = WEEKDAYS.index(match.group("last_day") or match.group("day"))
+            days += [(first + i) % 7 for i in range((last - first) % 7 + 1)]
+
+        elif match.group("start"):
+            start_hours, start_minutes, end_hours, end_minutes = (
+                int(g) for g in match.group("start", "start_m", "end", "end_m")
+            )
+            start = start_hours * 60 + start_minutes
+            end = end_hours * 60 + end_minutes
+
+            if start_minutes > 59 or end_minutes > 59:
+                supported = False
+            elif start >= MINUTES_PER_DAY or end > MINUTES_PER_DAY:
+                supported = False
+            else:
+                # Ranges ending before they start continue on the next day
+                times.append((start, end if end > start else end + MINUTES_PER_DAY))
+
+        elif match.group("off"):
+            closed = True
+
+        elif match.group("separator") == ";":
+            apply()
+            days, times, closed, supported = list(), list(), False, True
+            additional = False
+
+        elif match.group("other"):
+            supported = False
+
+    apply()
+    if not applied:
+        return None
+    return merge_intervals([interval for day in week for interval in day])
+
+
+@lru_cache(maxsize=OPENING_HOURS_CACHE_SIZE)
+def parse_opening_hours(opening_hours: str) -> OpeningHours:
+    if "24/7" in opening_hours:
+        description: Optional[str] = "Open 24 hours, 7 days a week"
+    else:
+        description = parse_description(opening_hours)
+
+    intervals = parse_intervals(opening_hours)
+    if description is None and intervals is not None:
+        # e.g. "Mo-Su 08:00-24:00", the intervals are kept and the hours
+        # described as written rather than left out
+        description = opening_hours
+
+    return OpeningHours(description, intervals)
+
+
+def format_opening_hours(opening_hours: str) -> str:
+    description = parse_opening_hours(opening_hours).description
+    if description is None:
+        print(f"Could not parse opening hours: {opening_hours}")
+        return ""
+    return description
+
+
+def opening_intervals(opening_hours: str) -> Optional[List[List[int]]]:
+    intervals = parse_opening_hours(opening_hours).intervals
+    if intervals is None:
+        return None
+    return [list(interval) for interval in intervals]
+
+
+def minute_of_week(weekday: int, time: Time) -> int:
+    # weekday as in datetime.weekday(), 0 is Monday
+    return weekday * MINUTES_PER_DAY + time.hour * 60 + time.minute
+
+
+def is_open(poi: Dict[str, Any], weekday: int, time: Time) -> Optional[bool]:
+    # None if the opening hours of the PoI are not known
+    intervals = poi.get("opening_intervals")
+    if intervals is None:
+        return None
+
+    t = minute_of_week(weekday, time)
+    return any(start <= t < end for start, end in intervals)
+
+
+class OpeningHoursIndex:
+    # Intervals of all the PoIs grouped by the hour of the week they
+    # overlap, a query only checks the intervals of its hour
+    def __init__(self, pois: Sequence[Dict[str, Any]]) -> None:
+        self.buckets: List[List[Tuple[int, int, int]]] = [
+            list() for _ in range(MINUTES_PER_WEEK // BUCKET_MINUTES)
+        ]
+
+        for i, poi in enumerate(pois):
+            for start, end in poi.get("opening_intervals") or list():
+                for bucket in range(
+                    start // BUCKET_MINUTES, (end - 1) // BUCKET_MINUTES + 1
+                ):
+                    self.buckets[bucket].append((start, end, i))
+
+    def open_at(self, weekday: int, time: Time) -> List[int]:
+        # Indices of the PoIs open at the given time, in increasing order
+        t = minute_of_week(weekday, time)
+        return sorted(
+            i for start, end, i in self.buckets[t // BUCKET_MINUTES] if start <= t < end
+        )
@@ -0,0 +1,86 @@
+import math
+import random
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from graph import AffineGeoreference, Coords, LatLngReference, PointIndex
+
+Range = Tuple[float, float]
+
+
+class Placement:
+    def __init__(self, lat: float, lng: float, distance: float, fallback: bool) -> None:
+        self.lat = lat
+        self.lng = lng
+        self.distance = distance  # feets from the closest PoI, inf if none is close
+        self.fallback = fallback
+
+
+class PoiPlacer:
+    # Dart throwing Poisson-disc sampler: candidates are drawn uniformly in the
+    # target box and checked in O(1) against the PoIs already placed, through a
+    # grid with cell size equal to the minimum distance. Sampling happens in a
+    # local planar frame (feets) centered on `origin`.
+    def __init__(
+        self,
+        min_distance: float,
+        origin: Tuple[float, float],
+        seed: Optional[float] = None,
+        max_attempts: int = 100,
+    ) -> None:
+        if max_attempts < 1:
+            raise ValueError("At least one attempt is needed to place a PoI")
+
+        self.min_distance = min_distance
+        self.max_attempts = max_attempts
+        self.random = random.Random(seed)
+
+        self.georeference = AffineGeoreference.from_reference(
+            LatLngReference(Coords(0, 0), *origin)
+        )
+        self.index = PointIndex(min_distance)
+        self.fallbacks = 0
+
+    def place(self, lng_range: Range, lat_range: Range) -> Placement:
+        best: Optional[Tuple[float, Coords, float, float]] = None
+
+        for _ in range(self.max_attempts):
+            lng = self.random.uniform(*lng_range)
+            lat = self.random.uniform(*lat_range)
+            coords = self.to_coords(lat, lng)
+
+            if not self.index.any_within(coords, self.min_distance):
+                self.index.insert(coords)
+                return Placement(lat, lng, math.inf, False)
+
+            distance = self.closest_distance(coords)
+            if best is None or distance > best[0]:
+                best = (distance, coords, lat, lng)
+
+        # Attempt budget exhausted: keep the candidate farthest from the others
+        assert best is not None
+        distance, coords, lat, lng = best
+        self.index.insert(coords)
+        self.fallbacks += 1
+
+        return Placement(lat, lng, distance, True)
+
+    def closest_distance(self, coords: Coords) -> float:
+        return min(
+            (
+                self.index.points[i].distance_to(coords)
+                for i in self.index.neighbours(coords, self.min_distance)
+            ),
+            default=math.inf,
+        )
+
+    def to_coords(self, lat: float, lng: float) -> Coords:
+        x, y = self.georeference.to_coords(np.array([lat, lng]))[0]
+        return Coords(float(x), float(y))
+
+
+def get_origin(boxes: Sequence[Tuple[Range, Range]]) -> Tuple[float, float]:
+    lats: List[float] = [lat for _, lat_range in boxes for lat in lat_range]
+    lngs: List[float] = [lng for lng_range, _ in boxes for lng in lng_range]
+    return (sum(lats) / len(lats), sum(lngs) / len(lngs))
@@ -0,0 +1,59 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from graph import Coords, Node, PointIndex
+from utils import POI_TO_NODE_MIN_DISTANCE, POI_TO_POI_MIN_DISTANCE
+
+
+class Conflict(NamedTuple):
+    kind: str  # "node" or "poi"
+    poi: int
+    other: int  # index of the node or of the second PoI
+    distance: float
+
+
+def get_coords(poi: Dict[str, Any]) -> Coords:
+    coords = poi["coords"]
+    return coords if isinstance(coords, Coords) else Coords(*coords)
+
+
+def find_conflicts(
+    nodes: Sequence[Node],
+    pois: Sequence[Dict[str, Any]],
+    feets_per_inch: float,
+    node_min_distance: Optional[float] = None,
+    poi_min_distance: Optional[float] = None,
+) -> List[Conflict]:
+    if node_min_distance is None:
+        node_min_distance = POI_TO_NODE_MIN_DISTANCE * feets_per_inch
+    if poi_min_distance is None:
+        poi_min_distance = POI_TO_POI_MIN_DISTANCE * feets_per_inch
+
+    pois_coords = [get_coords(poi) for poi in pois]
+    index = PointIndex(max(node_min_distance, poi_min_distance), pois_coords)
+
+    conflicts: List[Conflict] = list()
+
+    for node in nodes:
+        for i in index.within(node.coords, node_min_distance):
+            conflicts.append(
+                Conflict("node", i, node.index, node.distance_to(pois_coords[i]))
+            )
+
+    for i, j in index.close_pairs(poi_min_distance):
+        conflicts.append(
+            Conflict("poi", i, j, pois_coords[j].distance_to(pois_coords[i]))
+        )
+
+    return conflicts
+
+
+def describe_conflict(conflict: Conflict, pois: Sequence[Dict[str, Any]]) -> str:
+    poi = pois[conflict.poi]
+    if conflict.kind == "node":
+        return f"{poi['name']} ({conflict.poi}) is too close to node {conflict.other}"
+
+    other = pois[conflict.other]
+    return (
+        f"{poi['name']} ({conflict.poi}) is too close to "
+        f"{other['name']} ({conflict.other})"
+    )
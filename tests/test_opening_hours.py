@@ -0,0 +1,32 @@
+from opening_hours import (
+    MINUTES_PER_DAY,
+    format_opening_hours,
+    opening_intervals,
+    parse_opening_hours,
+)
+
+
+def test_description_and_intervals():
+    hours = parse_opening_hours("Mo-Fr 09:00-17:00")
+    assert hours.description == "Mo-Fr 9:00 AM - 5:00 PM"
+    assert hours.intervals == tuple(
+        (day * MINUTES_PER_DAY + 9 * 60, day * MINUTES_PER_DAY + 17 * 60)
+        for day in range(5)
+    )
+
+
+def test_unparsed_description_keeps_original_string():
+    # 24:00 is not a valid time for the description, but is for the intervals
+    opening_hours = "Mo-Su 08:00-24:00"
+    assert format_opening_hours(opening_hours) == opening_hours
+    assert opening_intervals(opening_hours) == [
+        [day * MINUTES_PER_DAY + 8 * 60, (day + 1) * MINUTES_PER_DAY]
+        for day in range(7)
+    ]
+
+
+def test_unsupported_hours_are_left_empty(capsys):
+    opening_hours = "sunrise-sunset"
+    assert format_opening_hours(opening_hours) == ""
+    assert opening_intervals(opening_hours) is None
+    assert "Could not parse opening hours" in capsys.readouterr().out